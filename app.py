@@ -6,34 +6,146 @@ Render 無料プラン向け 最小構成「レシピ投稿ミニアプリ」
 """
 from __future__ import annotations
 
+import base64
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import logging
 import os
-from datetime import datetime
-from typing import Optional, List
+import queue
+import re
+import secrets
+import sys
+import unicodedata
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Callable, Dict, Hashable, Iterable, Iterator, Optional, List, NamedTuple, TextIO, Tuple, Union
 
+import click
 from dotenv import load_dotenv  # .env から環境変数読込（無ければ無視される）
-from flask import Flask, request, redirect, url_for, render_template_string
+from flask import (
+    Flask, abort, after_this_request, g, jsonify, request, redirect, url_for, render_template, make_response, stream_with_context
+)
+from jinja2 import Template
 from sqlalchemy import (
-    create_engine, String, Integer, Text, DateTime, CheckConstraint, func
+    create_engine, String, Integer, Text, DateTime, CheckConstraint, Index, and_, delete, event, func, insert, literal,
+    select, text, tuple_
 )
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session
+from sqlalchemy.pool import QueuePool
 
 # ==============================
 # 環境変数の読み込み
 # ==============================
 load_dotenv()  # ローカル実行時のみ有効（Render 本番では不要だが無害）
 
+def _to_bool_env(value: Optional[str], default: bool = False) -> bool:
+    if value is None:
+        return default
+    return str(value).strip().lower() in {"1", "true", "yes", "on"}
+
+def _to_int_env(value: Optional[str], default: int, minimum: int = 1) -> int:
+    if value is None or not str(value).strip():
+        return default
+    try:
+        return max(minimum, int(str(value).strip()))
+    except ValueError:
+        return default
+
+# ==============================
+# メトリクス（Prometheus 形式, /metrics）
+# ==============================
+# prometheus_client が無ければ何もしないダミーに差し替える。
+# gunicorn の複数ワーカーで集計する場合は PROMETHEUS_MULTIPROC_DIR に空のディレクトリを
+# 指定して起動する（gunicorn.conf.py が起動時の掃除と終了ワーカーの後始末を行う）。
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess,
+    )
+    METRICS_AVAILABLE = True
+except ImportError:  # prometheus_client 未インストール環境
+    METRICS_AVAILABLE = False
+
+    class _NoopMetric:
+        def __init__(self, *args, **kwargs) -> None:
+            pass
+
+        def labels(self, *args, **kwargs) -> "_NoopMetric":
+            return self
+
+        def observe(self, value: float) -> None:
+            pass
+
+        def inc(self, amount: float = 1) -> None:
+            pass
+
+        def dec(self, amount: float = 1) -> None:
+            pass
+
+    Counter = Gauge = Histogram = _NoopMetric  # type: ignore[misc, assignment]
+
+REQUEST_LATENCY = Histogram(
+    "recipe_http_request_duration_seconds", "HTTP リクエストの処理時間", ["route", "method"]
+)
+REQUEST_COUNT = Counter(
+    "recipe_http_requests_total", "HTTP リクエスト数", ["route", "method", "status"]
+)
+DB_QUERY_LATENCY = Histogram(
+    "recipe_db_query_duration_seconds", "SQL 1 文の実行時間", ["statement"]
+)
+DB_POOL_WAIT = Histogram(
+    "recipe_db_pool_wait_seconds", "接続プールからの取り出し待ち時間",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+DB_POOL_TIMEOUTS = Counter("recipe_db_pool_timeouts_total", "接続プールの取り出しタイムアウト数")
+DB_POOL_CHECKED_OUT = Gauge(
+    "recipe_db_pool_checked_out_connections", "使用中の接続数", multiprocess_mode="livesum"
+)
+PAGE_CACHE_REQUESTS = Counter(
+    "recipe_page_cache_requests_total", "描画済みページキャッシュの参照数", ["result"]
+)
+RENDER_LATENCY = Histogram(
+    "recipe_render_duration_seconds", "テンプレートの描画時間", ["template"]
+)
+EXPORT_ROWS = Counter("recipe_export_rows_total", "/export で書き出した行数", ["format"])
+EXPORT_DURATION = Histogram(
+    "recipe_export_duration_seconds", "/export 1 回の所要時間", ["format"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+
+_STATEMENT_KINDS = {"select", "insert", "update", "delete", "copy", "with"}
+
+def _statement_kind(statement: str) -> str:
+    """メトリクスのラベル用に SQL の種類（先頭のキーワード）を取り出す。"""
+    head = statement.lstrip().split(None, 1)
+    kind = head[0].lower() if head else ""
+    return kind if kind in _STATEMENT_KINDS else "other"
+
 # ==============================
 # DB 接続ユーティリティ
 # ==============================
+def normalize_database_url(url: str) -> str:
+    """Render の "postgres://" を SQLAlchemy 用に "postgresql+psycopg2://" へ置換する。"""
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+psycopg2://", 1)
+    return url
+
 def get_database_url() -> Optional[str]:
-    """
-    DATABASE_URL を取得し、Render の "postgres://" を SQLAlchemy 用に
-    "postgresql+psycopg2://" へ置換する。
-    """
+    """DATABASE_URL を取得し、normalize_database_url() を通す。"""
     url = os.environ.get("DATABASE_URL")
-    if url and url.startswith("postgres://"):
-        url = url.replace("postgres://", "postgresql+psycopg2://", 1)
-    return url
+    return normalize_database_url(url) if url else url
 
 DATABASE_URL = get_database_url()
 if not DATABASE_URL:
@@ -41,8 +153,336 @@ if not DATABASE_URL:
     # あえて None のまま進める（ページ上で案内表示）
     pass
 
+# ==============================
+# 接続プール・ドライバ設定（環境変数で調整）
+# ==============================
+# DB_POOL_SIZE / DB_MAX_OVERFLOW   … 常時保持する接続数 / 一時的に追加できる接続数
+# DB_POOL_TIMEOUT                  … 空き接続を待つ最大秒数（超えると TimeoutError）
+# DB_POOL_RECYCLE                  … この秒数を超えた接続は作り直す（-1 で無効）
+# DB_PRE_PING                      … always: 毎回 ping / idle: DB_PRE_PING_IDLE 秒以上
+#                                    使われていなかった接続だけ ping / off: ping しない
+# DB_CONNECT_TIMEOUT               … 接続確立のタイムアウト秒（PostgreSQL）
+# DB_STATEMENT_TIMEOUT_MS          … 1 文の実行上限ミリ秒（PostgreSQL, 0 で無制限）
+# DB_KEEPALIVES_IDLE / _INTERVAL / _COUNT … TCP キープアライブ（PostgreSQL）
+class MeteredQueuePool(QueuePool):
+    """
+    checkout の待ち時間（新規接続の確立を含む）を recipe_db_pool_wait_seconds に、
+    タイムアウトを recipe_db_pool_timeouts_total に記録する QueuePool。
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except sa_exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        DB_POOL_WAIT.observe(time.perf_counter() - start)
+        return conn
+
+def get_engine_options(url: str) -> Dict[str, object]:
+    """create_engine に渡すプール・ドライバ設定を環境変数から組み立てる。"""
+    env = os.environ
+    pre_ping = (env.get("DB_PRE_PING") or "always").strip().lower()
+    options: Dict[str, object] = {"pool_pre_ping": pre_ping == "always"}
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # メモリ上の SQLite は専用のプールを使うので設定しない
+        return options
+
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=_to_int_env(env.get("DB_POOL_SIZE"), default=5),
+        max_overflow=_to_int_env(env.get("DB_MAX_OVERFLOW"), default=10, minimum=0),
+        pool_timeout=_to_int_env(env.get("DB_POOL_TIMEOUT"), default=30),
+        pool_recycle=_to_int_env(env.get("DB_POOL_RECYCLE"), default=1800, minimum=-1),
+    )
+    if parsed.get_backend_name() == "postgresql":
+        connect_args: Dict[str, object] = {
+            "connect_timeout": _to_int_env(env.get("DB_CONNECT_TIMEOUT"), default=10),
+            "keepalives": 1,
+            "keepalives_idle": _to_int_env(env.get("DB_KEEPALIVES_IDLE"), default=30),
+            "keepalives_interval": _to_int_env(env.get("DB_KEEPALIVES_INTERVAL"), default=10),
+            "keepalives_count": _to_int_env(env.get("DB_KEEPALIVES_COUNT"), default=3),
+        }
+        statement_timeout = _to_int_env(env.get("DB_STATEMENT_TIMEOUT_MS"), default=0, minimum=0)
+        if statement_timeout:
+            connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+        options["connect_args"] = connect_args
+    return options
+
+def _install_idle_ping(eng, idle_seconds: int) -> None:
+    """
+    DB_PRE_PING=idle 用。しばらく使われていなかった接続だけを checkout 時に ping し、
+    切れていれば DisconnectionError でプールに作り直させる（毎回の往復を省く）。
+    """
+
+    @event.listens_for(eng, "checkin")
+    def _on_checkin(dbapi_conn, record) -> None:
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(eng, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy) -> None:
+        checked_in_at = record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as exc:
+            raise sa_exc.DisconnectionError() from exc
+        finally:
+            cursor.close()
+
+# ==============================
+# スロークエリログ
+# ==============================
+# SLOW_QUERY_MS（既定 200, 0 で無効）以上かかった SQL を "recipe.sql" ロガーへ WARNING で出す。
+# パラメータは値を出さず、型だけを記録する（個人の入力内容をログに残さないため）。
+# SLOW_QUERY_EXPLAIN=1 のときは、SELECT が同じ文の過去最遅を更新した場合に限り
+# （文ごとに SLOW_QUERY_EXPLAIN_INTERVAL 秒に 1 回まで）別スレッド・別接続で
+# EXPLAIN (ANALYZE, BUFFERS)（SQLite では EXPLAIN QUERY PLAN）を取り、ログに添える。
+SLOW_QUERY_MS = _to_int_env(os.environ.get("SLOW_QUERY_MS"), default=200, minimum=0)
+SLOW_QUERY_EXPLAIN = _to_bool_env(os.environ.get("SLOW_QUERY_EXPLAIN"), default=False)
+SLOW_QUERY_EXPLAIN_INTERVAL = _to_int_env(os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL"), default=300)
+
+sql_logger = logging.getLogger("recipe.sql")
+
+def _normalize_sql(statement: str) -> str:
+    return " ".join(statement.split())
+
+def redact_parameters(parameters: object, executemany: bool = False) -> object:
+    """ログ用に値を伏せ、型名だけを残す。"""
+    if executemany and isinstance(parameters, (list, tuple)):
+        return f"<{len(parameters)} rows>"
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+class SlowQueryLog:
+    """遅い SQL を記録する。recent に直近 max_entries 件、worst に文ごとの最遅時間を持つ。"""
+
+    def __init__(self, max_entries: int = 100) -> None:
+        self.recent: "deque[Dict[str, object]]" = deque(maxlen=max_entries)
+        self.worst: Dict[str, float] = {}
+        self._explained_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, eng, statement: str, parameters: object, elapsed: float, executemany: bool) -> None:
+        sql = _normalize_sql(statement)
+        entry: Dict[str, object] = {
+            "sql": sql,
+            "ms": round(elapsed * 1000, 1),
+            "params": redact_parameters(parameters, executemany),
+        }
+        with self._lock:
+            is_worst = elapsed > self.worst.get(sql, 0.0)
+            if is_worst:
+                self.worst[sql] = elapsed
+            self.recent.append(entry)
+            want_plan = (
+                SLOW_QUERY_EXPLAIN and is_worst and not executemany
+                and _statement_kind(sql) == "select"
+                and time.monotonic() - self._explained_at.get(sql, -SLOW_QUERY_EXPLAIN_INTERVAL)
+                >= SLOW_QUERY_EXPLAIN_INTERVAL
+            )
+            if want_plan:
+                self._explained_at[sql] = time.monotonic()
+        sql_logger.warning("slow query %.1fms: %s params=%s", entry["ms"], sql, entry["params"])
+        if want_plan:
+            threading.Thread(
+                target=self._explain, args=(eng, statement, parameters, entry),
+                name="slow-query-explain", daemon=True,
+            ).start()
+
+    @staticmethod
+    def _explain(eng, statement: str, parameters: object, entry: Dict[str, object]) -> None:
+        """別接続で実行計画を取る。実行は必ずロールバックする。"""
+        if eng.dialect.name == "postgresql":
+            prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+        elif eng.dialect.name == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        else:
+            prefix = "EXPLAIN "
+        try:
+            raw = eng.raw_connection()
+            try:
+                cursor = raw.cursor()
+                cursor.execute(prefix + statement, parameters)
+                plan = "\n".join(" ".join(str(c) for c in row) for row in cursor.fetchall())
+                cursor.close()
+                raw.rollback()
+            finally:
+                raw.close()
+        except Exception as exc:
+            sql_logger.warning("EXPLAIN failed for slow query: %s (%s)", entry["sql"], exc)
+            return
+        entry["plan"] = plan
+        sql_logger.warning("plan for slow query %.1fms: %s\n%s", entry["ms"], entry["sql"], plan)
+
+slow_query_log = SlowQueryLog()
+
+def _install_metrics_hooks(eng) -> None:
+    """SQL 1 文ごとの実行時間（遅い文はスロークエリログにも）と、使用中の接続数を記録する。"""
+
+    # 開始時刻は文ごとの実行コンテキストに持たせる。失敗した文は after が呼ばれないが、
+    # コンテキストごと捨てられるので接続側に値が残り続けることはない
+    @event.listens_for(eng, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        context._recipe_query_started = time.perf_counter()
+
+    @event.listens_for(eng, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - context._recipe_query_started
+        DB_QUERY_LATENCY.labels(_statement_kind(statement)).observe(elapsed)
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_query_log.record(eng, statement, parameters, elapsed, executemany)
+
+    @event.listens_for(eng, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy) -> None:
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(eng, "checkin")
+    def _on_checkin(dbapi_conn, record) -> None:
+        DB_POOL_CHECKED_OUT.dec()
+
+def create_app_engine(url: str):
+    """環境変数の設定を反映した SQLAlchemy エンジンを作る。"""
+    eng = create_engine(url, **get_engine_options(url))
+    if (os.environ.get("DB_PRE_PING") or "").strip().lower() == "idle":
+        _install_idle_ping(eng, _to_int_env(os.environ.get("DB_PRE_PING_IDLE"), default=30, minimum=0))
+    _install_metrics_hooks(eng)
+    return eng
+
 # SQLAlchemy エンジン（DB 接続）
-engine = create_engine(DATABASE_URL, pool_pre_ping=True) if DATABASE_URL else None
+# import 時には作らず、最初に使う時点で作る（ワーカー起動を速くするため）。
+# スキーマの作成も import 時には行わない（flask --app app init-db / db_init.py で行う）。
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """アプリ共通のエンジン。DATABASE_URL 未設定なら None。初回呼び出し時に生成する。"""
+    global _engine
+    if _engine is None and DATABASE_URL:
+        with _engine_lock:
+            if _engine is None:
+                eng = create_app_engine(DATABASE_URL)
+                prepare_search_engine(eng)
+                if AUTO_INIT_DB:
+                    init_schema(eng)
+                _engine = eng
+    return _engine
+
+# ==============================
+# 読み取りレプリカ（任意）
+# ==============================
+# DATABASE_REPLICA_URL にカンマ区切りで 1 つ以上の URL を指定すると、一覧・検索・
+# API の読み取りをレプリカへラウンドロビンで振り分ける。書き込みは常にプライマリ。
+# - 接続に失敗した / 遅延が REPLICA_MAX_LAG 秒を超えたレプリカは REPLICA_RETRY 秒間外す
+# - 遅延は REPLICA_CHECK_INTERVAL 秒ごとに確認する。受信済みの WAL を再生し終えていれば 0、
+#   再生が追いついていないときだけ最後に再生したトランザクションの時刻からの経過秒数
+#   （書き込みの少ないプライマリでは再生時刻が古いままなので、それだけでは遅延とみなせない）
+# - 使えるレプリカが無ければプライマリから読む
+REPLICA_MAX_LAG = _to_int_env(os.environ.get("REPLICA_MAX_LAG"), default=30)
+REPLICA_RETRY = _to_int_env(os.environ.get("REPLICA_RETRY"), default=30)
+REPLICA_CHECK_INTERVAL = _to_int_env(os.environ.get("REPLICA_CHECK_INTERVAL"), default=10)
+
+def get_replica_urls() -> List[str]:
+    """DATABASE_REPLICA_URL を分解し、それぞれ normalize_database_url() を通す。"""
+    urls = []
+    for url in (os.environ.get("DATABASE_REPLICA_URL") or "").split(","):
+        url = url.strip()
+        if url:
+            urls.append(normalize_database_url(url))
+    return urls
+
+class _Replica:
+    def __init__(self, eng) -> None:
+        self.engine = eng
+        self.down_until = 0.0
+        self.checked_at = 0.0
+
+class ReplicaRouter:
+    """読み取り用の接続をレプリカからラウンドロビンで取り出す。"""
+
+    def __init__(self, engines: List) -> None:
+        self.replicas = [_Replica(eng) for eng in engines]
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def connect(self) -> Optional[Connection]:
+        """使えるレプリカへの接続。全滅なら None（呼び出し側でプライマリを使う）。"""
+        start = next(self._counter)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            now = time.monotonic()
+            if replica.down_until > now:
+                continue
+            try:
+                conn = replica.engine.connect()
+            except Exception:
+                self._mark_down(replica, now)
+                continue
+            if now - replica.checked_at >= REPLICA_CHECK_INTERVAL:
+                replica.checked_at = now
+                if not self._is_fresh(conn):
+                    conn.close()
+                    self._mark_down(replica, now)
+                    continue
+            return conn
+        return None
+
+    def _mark_down(self, replica: _Replica, now: float) -> None:
+        with self._lock:
+            replica.down_until = now + REPLICA_RETRY
+
+    @staticmethod
+    def _is_fresh(conn: Connection) -> bool:
+        if conn.dialect.name != "postgresql":
+            return True
+        try:
+            lag = conn.execute(text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )).scalar()
+            conn.rollback()
+        except Exception:
+            return False
+        return float(lag or 0) <= REPLICA_MAX_LAG
+
+_replica_router: Optional[ReplicaRouter] = None
+_replica_router_ready = False
+
+def get_replica_router() -> Optional[ReplicaRouter]:
+    """DATABASE_REPLICA_URL が設定されていればレプリカの振り分け器（初回呼び出し時に生成）。"""
+    global _replica_router, _replica_router_ready
+    if not _replica_router_ready:
+        with _engine_lock:
+            if not _replica_router_ready:
+                engines = []
+                for url in get_replica_urls():
+                    eng = create_app_engine(url)
+                    prepare_search_engine(eng)
+                    engines.append(eng)
+                _replica_router = ReplicaRouter(engines) if engines else None
+                _replica_router_ready = True
+    return _replica_router
+
+def connect_for_read(use_primary: bool = False) -> Connection:
+    """
+    読み取り用の接続。レプリカが設定されていればレプリカ、無ければプライマリ。
+    use_primary=True（直前に自分で書き込んだ場合など）は常にプライマリ。
+    """
+    if not use_primary:
+        router = get_replica_router()
+        if router is not None:
+            conn = router.connect()
+            if conn is not None:
+                return conn
+    return get_engine().connect()
 
 # ==============================
 # モデル定義
@@ -50,6 +490,10 @@ engine = create_engine(DATABASE_URL, pool_pre_ping=True) if DATABASE_URL else No
 class Base(DeclarativeBase):
     pass
 
+_SQLITE_DATETIME = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d",
+)
+
 class Recipe(Base):
     """
     recipes テーブル
@@ -69,13 +513,393 @@ class Recipe(Base):
     minutes: Mapped[int] = mapped_column(Integer, nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     # DBサーバ側で現在時刻を入れる。タイムゾーン付きでも問題なし。
+    # SQLite の CURRENT_TIMESTAMP は秒精度の文字列なので、バインド値も同じ書式に
+    # 揃えておく（揃えないとカーソル比較が文字列比較でずれる）。
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True).with_variant(_SQLITE_DATETIME, "sqlite"),
+        server_default=func.now(),
+        nullable=False,
     )
 
-# 起動時にテーブル自動作成（DB 未設定時はスキップ）
-if engine is not None:
-    Base.metadata.create_all(engine)
+# 一覧の並び順 (created_at DESC, id DESC) とカーソル比較をそのまま満たす複合インデックス。
+# これが無いと一覧のたびに全件ソートになる。
+LIST_INDEX_NAME = "ix_recipes_created_at_id_desc"
+list_index = Index(LIST_INDEX_NAME, Recipe.created_at.desc(), Recipe.id.desc())
+
+# 所要分数の区分（一覧の絞り込み ?minutes= で使う）。値は (表示名, 下限, 上限) で、両端を含む。
+MINUTES_BUCKETS: Dict[str, Tuple[str, Optional[int], Optional[int]]] = {
+    "quick": ("10分以内", None, 10),
+    "medium": ("11〜30分", 11, 30),
+    "long": ("31分以上", 31, None),
+}
+
+def minutes_bucket_conditions(bucket: str, use_minutes_index: bool = True) -> list:
+    """
+    区分の WHERE 条件。部分インデックスの条件と同じ SQL になるよう、境界値はバインド変数
+    ではなくリテラルで埋め込む（SQLite はそうしないと部分インデックスを使わない）。
+    use_minutes_index=False では minutes + 0 と書き、(minutes, id) の範囲検索に使わせない。
+    新しい順の絞り込みは区分ごとの部分インデックスを先頭から読めば済むが、SQLite の
+    プランナは範囲検索 + ソートを選びがちなため。部分インデックスの条件もこちらの形で作る。
+    """
+    _, low, high = MINUTES_BUCKETS[bucket]
+    column = Recipe.minutes if use_minutes_index else Recipe.minutes + literal(0, literal_execute=True)
+    conditions = []
+    if low is not None:
+        conditions.append(column >= literal(low, literal_execute=True))
+    if high is not None:
+        conditions.append(column <= literal(high, literal_execute=True))
+    return conditions
+
+# 所要分数順の一覧用 (minutes, id)。区分で絞り込んだ所要分数順もこの範囲走査で済む。
+minutes_index = Index("ix_recipes_minutes_id", Recipe.minutes, Recipe.id)
+# 区分で絞り込んだ新しい順の一覧用。区分ごとの部分インデックスなので、絞り込んでも
+# 先頭 1 ページ分を読むだけで済む（全体の複合インデックスを読み飛ばしながら探さない）。
+bucket_indexes = [
+    Index(
+        f"ix_recipes_{name}_created_at_id_desc",
+        Recipe.created_at.desc(),
+        Recipe.id.desc(),
+        postgresql_where=and_(*minutes_bucket_conditions(name, use_minutes_index=False)),
+        sqlite_where=and_(*minutes_bucket_conditions(name, use_minutes_index=False)),
+    )
+    for name in MINUTES_BUCKETS
+]
+
+class IdempotencyKey(Base):
+    """
+    idempotency_keys テーブル（処理済みの投稿の記録。二重送信の判定に使う）
+    - key:        フォームのトークン（API は Idempotency-Key ヘッダ）と入力内容の SHA-256
+    - recipe_id:  そのとき作成したレシピ（グループコミット経由では NULL）
+    - created_at: 記録日時。IDEMPOTENCY_TTL 秒を過ぎた行は無視し、定期的に削除する
+    """
+    __tablename__ = "idempotency_keys"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    recipe_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True).with_variant(_SQLITE_DATETIME, "sqlite"),
+        server_default=func.now(),
+        nullable=False,
+        index=True,
+    )
+
+# ==============================
+# 全文検索用のバイグラム索引
+# ==============================
+# 日本語は単語区切りが無いため、タイトル・説明を「2 文字ずつ」の語（バイグラム）に
+# 分けて転置インデックスを作る。空白・記号で区切られた各語は、バイグラムに加えて
+# 末尾 1 文字も語として持つ（1 文字検索を前方一致で拾うため）。
+# - PostgreSQL: recipe_grams() で tsvector を作り、その式に GIN インデックスを張る
+#   （トリガ不要。COPY での取り込みでも自動で索引される）
+# - SQLite:     FTS5 仮想テーブル recipes_search をトリガで同期する。語の分割は
+#   接続ごとに登録する Python 関数 recipe_grams() で行う
+SEARCH_INDEX_NAME = "ix_recipes_search_grams"
+_SEARCH_SPLIT = re.compile(r"[\W_]+")
+
+def recipe_grams(value: Optional[str]) -> List[str]:
+    """索引に入れる語（バイグラム + 各語の末尾 1 文字）。SQLite 用。"""
+    grams = set()
+    for word in _SEARCH_SPLIT.split(unicodedata.normalize("NFKC", value or "").lower()):
+        if not word:
+            continue
+        grams.update(word[i:i + 2] for i in range(len(word) - 1))
+        grams.add(word[-1])
+    return sorted(grams)
+
+def _sqlite_match_query(q: str) -> str:
+    """検索語を FTS5 の MATCH 式にする。2 文字以上はバイグラムの AND、1 文字は前方一致。"""
+    terms: List[str] = []
+    for word in _SEARCH_SPLIT.split(unicodedata.normalize("NFKC", q).lower()):
+        if len(word) == 1:
+            terms.append(f'"{word}"*')
+        else:
+            terms.extend(f'"{word[i:i + 2]}"' for i in range(len(word) - 1))
+    return " AND ".join(dict.fromkeys(terms))
+
+def _register_sqlite_functions(dbapi_conn, _record) -> None:
+    dbapi_conn.create_function(
+        "recipe_grams", 1, lambda v: " ".join(recipe_grams(v)), deterministic=True
+    )
+
+_PG_SEARCH_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION recipe_grams(t text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+      WITH words AS (
+        SELECT w FROM regexp_split_to_table(
+          lower(normalize(coalesce(t, ''), NFKC)), '[[:space:][:punct:]]+') AS w
+        WHERE w <> ''
+      )
+      SELECT array_to_tsvector(coalesce(array_agg(g), '{}'::text[])) FROM (
+        SELECT substr(w, i, 2) FROM words, generate_series(1, length(w) - 1) AS i
+        UNION
+        SELECT right(w, 1) FROM words
+      ) AS s(g)
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipe_grams_query(q text) RETURNS tsquery
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+      WITH words AS (
+        SELECT w FROM regexp_split_to_table(
+          lower(normalize(coalesce(q, ''), NFKC)), '[[:space:][:punct:]]+') AS w
+        WHERE w <> ''
+      )
+      SELECT coalesce(string_agg(tok, ' & '), '')::tsquery FROM (
+        SELECT quote_literal(substr(w, i, 2)) FROM words, generate_series(1, length(w) - 1) AS i
+        UNION
+        SELECT quote_literal(w) || ':*' FROM words WHERE length(w) = 1
+      ) AS s(tok)
+    $$
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_NAME} ON recipes
+    USING gin (recipe_grams(coalesce(title, '') || ' ' || coalesce(description, '')))
+    """,
+]
+
+_SQLITE_SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_search_ai AFTER INSERT ON recipes BEGIN
+      INSERT INTO recipes_search (rowid, title, description)
+      VALUES (new.id, recipe_grams(new.title), recipe_grams(new.description));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_search_ad AFTER DELETE ON recipes BEGIN
+      DELETE FROM recipes_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_search_au AFTER UPDATE ON recipes BEGIN
+      DELETE FROM recipes_search WHERE rowid = old.id;
+      INSERT INTO recipes_search (rowid, title, description)
+      VALUES (new.id, recipe_grams(new.title), recipe_grams(new.description));
+    END
+    """,
+]
+
+def prepare_search_engine(eng) -> None:
+    """SQLite の場合、接続ごとに recipe_grams() を登録する（最初の接続より前に呼ぶこと）。"""
+    if eng.dialect.name == "sqlite":
+        event.listen(eng, "connect", _register_sqlite_functions)
+
+def ensure_search_index(eng) -> None:
+    """検索用の関数・索引を作成する（何度呼んでもよい）。SQLite では既存行も索引する。"""
+    with eng.begin() as conn:
+        if eng.dialect.name == "postgresql":
+            for ddl in _PG_SEARCH_DDL:
+                conn.exec_driver_sql(ddl)
+        elif eng.dialect.name == "sqlite":
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'recipes_search'"
+            ).first()
+            if not exists:
+                conn.exec_driver_sql(
+                    "CREATE VIRTUAL TABLE recipes_search USING fts5(title, description)"
+                )
+                conn.exec_driver_sql(
+                    "INSERT INTO recipes_search (rowid, title, description) "
+                    "SELECT id, recipe_grams(title), recipe_grams(description) FROM recipes"
+                )
+            for ddl in _SQLITE_SEARCH_TRIGGERS:
+                conn.exec_driver_sql(ddl)
+
+# ==============================
+# 所要分数の区分ごとの件数（ファセット）
+# ==============================
+# 「10分以内 (123)」のような件数を毎回 COUNT(*) せずに出せるよう、区分ごとの件数を
+# recipe_minutes_counts に持ち、recipes の INSERT / DELETE / UPDATE 時にトリガで増減する。
+# トリガなので、フォーム投稿・グループコミット・一括インポート（COPY）・db_init.py の
+# どの経路でも同じトランザクションで更新される。init_schema() はトリガが無いときや
+# 区分の定義が変わったときだけ作り直して数え直す（それ以外は何もしないので、毎回実行しても軽い）。
+# PostgreSQL は文単位のトリガ（遷移テーブル）なので、COPY で 100 万行入れても更新は 1 回。
+# 同じ区分への同時投稿は件数行のロックでコミット順に並ぶ（投稿頻度が低い前提）。
+class MinutesBucketCount(Base):
+    """
+    recipe_minutes_counts テーブル（MINUTES_BUCKETS の区分ごとの件数）
+    - bucket:  MINUTES_BUCKETS のキー
+    - recipes: その区分のレシピ件数
+    """
+    __tablename__ = "recipe_minutes_counts"
+
+    bucket: Mapped[str] = mapped_column(String(20), primary_key=True)
+    recipes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+def _minutes_bucket_case(column: str) -> str:
+    """MINUTES_BUCKETS から「minutes → 区分名」の CASE 式（SQL 文字列）を作る。"""
+    whens = []
+    for name, (_, low, high) in MINUTES_BUCKETS.items():
+        conditions = []
+        if low is not None:
+            conditions.append(f"{column} >= {int(low)}")
+        if high is not None:
+            conditions.append(f"{column} <= {int(high)}")
+        whens.append(f"WHEN {' AND '.join(conditions)} THEN '{name}'")
+    return f"CASE {' '.join(whens)} END"
+
+def _pg_facet_ddl() -> List[str]:
+    # 遷移テーブルを使うトリガは 1 つのイベントにしか付けられないので、3 つに分ける
+    # （CREATE OR REPLACE TRIGGER は PostgreSQL 14 以降なので、DROP してから作り直す）
+    delta = """
+        UPDATE recipe_minutes_counts AS c SET recipes = c.recipes {sign} d.n
+        FROM (SELECT recipe_minutes_bucket(minutes) AS bucket, count(*) AS n
+              FROM {rows} GROUP BY 1) AS d
+        WHERE c.bucket = d.bucket;"""
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION recipe_minutes_bucket(minutes integer) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT {_minutes_bucket_case("minutes")} $$
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION recipes_minutes_counts_sync() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+          IF TG_OP IN ('DELETE', 'UPDATE') THEN{delta.format(sign="-", rows="old_rows")}
+          END IF;
+          IF TG_OP IN ('INSERT', 'UPDATE') THEN{delta.format(sign="+", rows="new_rows")}
+          END IF;
+          RETURN NULL;
+        END
+        $$
+        """,
+        "DROP TRIGGER IF EXISTS recipes_minutes_counts_ai ON recipes",
+        "DROP TRIGGER IF EXISTS recipes_minutes_counts_ad ON recipes",
+        "DROP TRIGGER IF EXISTS recipes_minutes_counts_au ON recipes",
+        """
+        CREATE TRIGGER recipes_minutes_counts_ai AFTER INSERT ON recipes
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION recipes_minutes_counts_sync()
+        """,
+        """
+        CREATE TRIGGER recipes_minutes_counts_ad AFTER DELETE ON recipes
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION recipes_minutes_counts_sync()
+        """,
+        """
+        CREATE TRIGGER recipes_minutes_counts_au AFTER UPDATE ON recipes
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION recipes_minutes_counts_sync()
+        """,
+    ]
+
+def _sqlite_facet_ddl() -> List[str]:
+    def bump(sign: str, row: str) -> str:
+        return (
+            f"UPDATE recipe_minutes_counts SET recipes = recipes {sign} 1 "
+            f"WHERE bucket = {_minutes_bucket_case(row + '.minutes')};"
+        )
+
+    return [
+        "DROP TRIGGER IF EXISTS recipes_minutes_counts_ai",
+        "DROP TRIGGER IF EXISTS recipes_minutes_counts_ad",
+        "DROP TRIGGER IF EXISTS recipes_minutes_counts_au",
+        f"CREATE TRIGGER recipes_minutes_counts_ai AFTER INSERT ON recipes BEGIN {bump('+', 'new')} END",
+        f"CREATE TRIGGER recipes_minutes_counts_ad AFTER DELETE ON recipes BEGIN {bump('-', 'old')} END",
+        f"CREATE TRIGGER recipes_minutes_counts_au AFTER UPDATE OF minutes ON recipes "
+        f"BEGIN {bump('-', 'old')} {bump('+', 'new')} END",
+    ]
+
+_FACET_TRIGGERS = ("recipes_minutes_counts_ai", "recipes_minutes_counts_ad", "recipes_minutes_counts_au")
+
+def _facet_fingerprint(ddl: List[str]) -> str:
+    return hashlib.sha256("\n".join(ddl).encode("utf-8")).hexdigest()[:16]
+
+def _facet_ddl(dialect: str) -> List[str]:
+    """件数表のトリガを作り直す DDL。PostgreSQL では定義の指紋を関数のコメントに残す。"""
+    if dialect == "postgresql":
+        ddl = _pg_facet_ddl()
+        return ddl + [f"COMMENT ON FUNCTION recipes_minutes_counts_sync() IS '{_facet_fingerprint(ddl)}'"]
+    if dialect == "sqlite":
+        return _sqlite_facet_ddl()
+    return []
+
+def _minutes_counts_current(conn: Connection) -> bool:
+    """トリガが揃っていて定義も今のコードと同じで、件数表に全区分の行があるか。"""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        fingerprint = conn.exec_driver_sql(
+            "SELECT obj_description(to_regprocedure('recipes_minutes_counts_sync()'), 'pg_proc')"
+        ).scalar()
+        triggers = {name for (name,) in conn.exec_driver_sql(
+            "SELECT tgname FROM pg_trigger WHERE tgrelid = 'recipes'::regclass"
+        )}
+        if fingerprint != _facet_fingerprint(_pg_facet_ddl()) or not triggers.issuperset(_FACET_TRIGGERS):
+            return False
+    elif dialect == "sqlite":
+        # SQLite は CREATE TRIGGER の文をそのまま保存しているので、文字列で比べられる
+        stored = {sql for (sql,) in conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'recipes_minutes_counts_%'"
+        )}
+        if stored != {ddl for ddl in _sqlite_facet_ddl() if ddl.startswith("CREATE")}:
+            return False
+    else:
+        return False
+    buckets = set(conn.execute(select(MinutesBucketCount.bucket)).scalars())
+    return buckets == set(MINUTES_BUCKETS)
+
+def ensure_minutes_counts(eng, force: bool = False) -> None:
+    """
+    件数表のトリガが無い・区分の定義が変わった（または force）ときだけ、トリガを作り直して
+    同じトランザクションで数え直す。PostgreSQL では数え直しの間だけ recipes への書き込みを止める
+    （読み取りは止めない）。トリガが最新なら何もしない（ロックも取らない）。
+    """
+    if not force:
+        with eng.connect() as conn:
+            if _minutes_counts_current(conn):
+                return
+    with eng.begin() as conn:
+        if eng.dialect.name == "postgresql":
+            conn.exec_driver_sql("LOCK TABLE recipes IN SHARE ROW EXCLUSIVE MODE")
+        for statement in _facet_ddl(eng.dialect.name):
+            conn.exec_driver_sql(statement)
+        counts = dict(conn.exec_driver_sql(
+            f"SELECT {_minutes_bucket_case('minutes')} AS bucket, count(*) FROM recipes GROUP BY 1"
+        ).all())
+        conn.execute(delete(MinutesBucketCount))
+        conn.execute(
+            insert(MinutesBucketCount),
+            [{"bucket": name, "recipes": counts.get(name, 0)} for name in MINUTES_BUCKETS],
+        )
+
+def fetch_minutes_counts(conn: Connection) -> Dict[str, int]:
+    """
+    区分ごとの件数（件数表の数行を読むだけ）。区分は minutes の全範囲を覆うので、
+    合計がそのままレシピの総数になる（PostgreSQL で全件走査になる COUNT(*) の代わり）。
+    """
+    rows = conn.execute(select(MinutesBucketCount.bucket, MinutesBucketCount.recipes)).all()
+    counts = dict.fromkeys(MINUTES_BUCKETS, 0)
+    counts.update((bucket, n) for bucket, n in rows if bucket in counts)
+    return counts
+
+def try_fetch_minutes_counts(conn: Connection) -> Optional[Dict[str, int]]:
+    """
+    fetch_minutes_counts の失敗（件数表がまだ無い古い DB など）を None にして、一覧の表示は続ける。
+    失敗したトランザクションは巻き戻すので、同じ接続で続けてクエリを実行してよい。
+    """
+    try:
+        return fetch_minutes_counts(conn)
+    except Exception:
+        conn.rollback()
+        logging.getLogger("recipe.facets").warning("failed to read minutes counts", exc_info=True)
+        return None
+
+# ==============================
+# スキーマ作成（ブートストラップ）
+# ==============================
+# 本番ではデプロイ時に 1 回 `flask --app app init-db`（または db_init.py）を実行する。
+# AUTO_INIT_DB=1 のときは、最初にエンジンを使う時点で自動的に実行する（ローカル向け）。
+AUTO_INIT_DB = _to_bool_env(os.environ.get("AUTO_INIT_DB"), default=False)
+
+def init_schema(eng) -> None:
+    """テーブル・インデックス・検索索引・件数表を作成する（何度実行してもよい）。"""
+    Base.metadata.create_all(eng)
+    # create_all は既存テーブルへインデックスを追加しないため、個別に作成しておく
+    for index in (list_index, minutes_index, *bucket_indexes):
+        index.create(eng, checkfirst=True)
+    ensure_search_index(eng)
+    ensure_minutes_counts(eng)
 
 # ==============================
 # Flask アプリ本体
@@ -90,25 +914,7 @@ PAGE_TEMPLATE = """
 <meta charset="utf-8">
 <meta name="viewport" content="width=device-width, initial-scale=1">
 <title>レシピ投稿ミニアプリ</title>
-<style>
-  body { font-family: system-ui, -apple-system, Segoe UI, Roboto, "Helvetica Neue", Arial, "Noto Sans JP", sans-serif; margin: 2rem; color:#222; }
-  h1 { margin-bottom: 0.5rem; }
-  .notice { padding: 0.75rem 1rem; background:#fff3cd; border:1px solid #ffeeba; border-radius:8px; margin:1rem 0; }
-  .errors { padding: 0.75rem 1rem; background:#f8d7da; border:1px solid #f5c6cb; color:#721c24; border-radius:8px; margin:1rem 0; }
-  form { display: grid; gap: 0.75rem; max-width: 520px; margin: 1rem 0 2rem; }
-  label { font-weight: 600; }
-  input[type="text"], input[type="number"], textarea {
-    width: 100%; padding: 0.6rem 0.7rem; border:1px solid #ccc; border-radius:8px; font-size: 1rem;
-  }
-  textarea { min-height: 120px; }
-  .btn { display:inline-block; padding:0.6rem 1rem; background:#0969da; color:#fff; border:none; border-radius:8px; cursor:pointer; font-weight:600; }
-  .btn:hover { background:#0757b3; }
-  .list { margin-top: 1rem; }
-  .card { border:1px solid #e5e7eb; border-radius:12px; padding:1rem; margin:0.5rem 0; background:#fff; }
-  .meta { color:#555; font-size:0.9rem; margin-top:0.25rem; }
-  .empty { color:#666; }
-  .footer { margin-top:2rem; color:#666; font-size:0.9rem; }
-</style>
+<link rel="stylesheet" href="{{ url_for('stylesheet', digest=stylesheet_digest) }}">
 </head>
 <body>
   <h1>レシピ投稿ミニアプリ</h1>
@@ -150,23 +956,59 @@ PAGE_TEMPLATE = """
     </div>
   </form>
 
-  <h2>レシピ一覧</h2>
-  <div class="list">
-    {% if recipes %}
-      {% for r in recipes %}
-        <div class="card">
-          <div><strong>{{ r.title }}</strong></div>
-          <div class="meta">所要分数: {{ r.minutes }} 分 / 投稿日時(UTC): {{ r.created_at }}</div>
-          {% if r.description %}
-            <div style="margin-top:0.5rem; white-space:pre-wrap;">{{ r.description }}</div>
-          {% endif %}
-        </div>
+  <form class="search" method="get" action="{{ url_for('search') }}">
+    <input name="q" type="text" maxlength="100" placeholder="タイトル・説明を検索" value="{{ search.q if search else '' }}">
+    <button class="btn" type="submit">検索</button>
+  </form>
+
+  {% if search %}
+    <h2>「{{ search.q }}」の検索結果</h2>
+    <p><a href="{{ url_for('index') }}">&larr; 一覧に戻る</a></p>
+  {% else %}
+    <h2>レシピ一覧{% if recipe_total is not none %}（全 {{ recipe_total }} 件）{% endif %}</h2>
+    <nav class="filters">
+      <span>所要時間:</span>
+      {% if view.minutes %}<a href="{{ url_for('index', size=size, sort=view.url_args().sort) }}">すべて{% if recipe_total is not none %} ({{ recipe_total }}){% endif %}</a>{% else %}<strong>すべて{% if recipe_total is not none %} ({{ recipe_total }}){% endif %}</strong>{% endif %}
+      {% for key, bucket in minutes_buckets.items() %}
+        {% if view.minutes == key %}<strong>{{ bucket[0] }}{% if minutes_counts %} ({{ minutes_counts[key] }}){% endif %}</strong>{% else %}<a href="{{ url_for('index', minutes=key, size=size, sort=view.url_args().sort) }}">{{ bucket[0] }}{% if minutes_counts %} ({{ minutes_counts[key] }}){% endif %}</a>{% endif %}
       {% endfor %}
+    </nav>
+    <nav class="filters">
+      <span>並び順:</span>
+      {% for key, order in sort_orders.items() %}
+        {% if view.sort == key %}<strong>{{ order.label }}</strong>{% else %}<a href="{{ url_for('index', minutes=view.minutes, size=size, sort=(key if key != 'new' else none)) }}">{{ order.label }}</a>{% endif %}
+      {% endfor %}
+    </nav>
+  {% endif %}
+  <div class="list">
+    {# recipes はストリーミング時にジェネレータになるため、for-else で空判定する #}
+    {% for r in recipes %}
+      <div class="card">
+        <div><strong>{{ r.title }}</strong></div>
+        <div class="meta">所要分数: {{ r.minutes }} 分 / 投稿日時(UTC): {{ r.created_at }}</div>
+        {% if r.description %}
+          <div class="desc">{{ r.description }}</div>
+        {% endif %}
+      </div>
     {% else %}
-      <div class="empty">投稿はまだありません。最初のレシピを投稿してみましょう！</div>
-    {% endif %}
+      <div class="empty">{% if search %}該当するレシピはありません。{% else %}投稿はまだありません。最初のレシピを投稿してみましょう！{% endif %}</div>
+    {% endfor %}
   </div>
 
+  {% if search %}
+    {% if search.prev_page or search.next_page %}
+      <div class="pager">
+        <span>{% if search.prev_page %}<a href="{{ url_for('search', q=search.q, page=search.prev_page, size=size) }}">&larr; 前へ</a>{% endif %}</span>
+        <span>{% if search.next_page %}<a href="{{ url_for('search', q=search.q, page=search.next_page, size=size) }}">次へ &rarr;</a>{% endif %}</span>
+      </div>
+    {% endif %}
+  {% elif pager.newer_cursor or pager.older_cursor %}
+    <div class="pager">
+      <span>{% if pager.newer_cursor %}<a href="{{ url_for('index', after=pager.newer_cursor, size=size, **view.url_args()) }}">&larr; {% if view.sort == 'new' %}新しいレシピ{% else %}前へ{% endif %}</a>{% endif %}</span>
+      <span>{% if pager.older_cursor %}<a href="{{ url_for('index', before=pager.older_cursor, size=size, **view.url_args()) }}">{% if view.sort == 'new' %}古いレシピ{% else %}次へ{% endif %} &rarr;</a>{% endif %}</span>
+    </div>
+  {% endif %}
+
   <div class="footer">
     <code>DEBUG={{ debug|lower }}</code> / <code>PORT={{ port }}</code>
   </div>
@@ -174,10 +1016,766 @@ PAGE_TEMPLATE = """
 </html>
 """
 
-def _to_bool_env(value: Optional[str], default: bool = False) -> bool:
-    if value is None:
-        return default
-    return str(value).strip().lower() in {"1", "true", "yes", "on"}
+# PAGE_TEMPLATE のコンパイル済みテンプレート（初回利用時に 1 回だけ生成）。
+# render_template_string は呼ぶたびにパース・コンパイルが走るため使わない。
+_page_template: Optional[Template] = None
+
+def get_page_template() -> Template:
+    global _page_template
+    if _page_template is None:
+        _page_template = app.jinja_env.from_string(PAGE_TEMPLATE)
+    return _page_template
+
+# ==============================
+# スタイルシート（static/app.css）
+# ==============================
+# 内容のハッシュを URL に含め（/assets/app.<hash>.css）、1 年間 immutable でキャッシュさせる。
+# CSS を書き換えると URL も変わるので、ブラウザが古いファイルを使い続けることはない。
+STYLESHEET_FILE = os.path.join(app.root_path, "static", "app.css")
+with open(STYLESHEET_FILE, "rb") as _f:
+    _STYLESHEET = _f.read()
+STYLESHEET_DIGEST = hashlib.sha256(_STYLESHEET).hexdigest()[:12]
+# 圧縮結果（Content-Encoding ごと）。compress_response が最初の要求時に埋める
+_STYLESHEET_VARIANTS: Dict[str, bytes] = {}
+app.jinja_env.globals["stylesheet_digest"] = STYLESHEET_DIGEST
+
+@app.route("/assets/app.<digest>.css")
+def stylesheet(digest: str):
+    """フィンガープリント付きのスタイルシート。古いハッシュは 404。"""
+    if digest != STYLESHEET_DIGEST:
+        abort(404)
+    resp = app.response_class(_STYLESHEET, mimetype="text/css")
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 365 * 24 * 3600
+    resp.cache_control.immutable = True
+    return compress_response(resp, _STYLESHEET_VARIANTS)
+
+# ==============================
+# 一覧のページング（キーセット / カーソル方式）
+# ==============================
+# OFFSET を使わず (created_at, id) を境界値として次ページを取得するため、
+# テーブルが大きくなっても 1 ページ分の行だけを読めば済む。
+PAGE_SIZE = _to_int_env(os.environ.get("PAGE_SIZE"), default=20)
+MAX_PAGE_SIZE = max(PAGE_SIZE, _to_int_env(os.environ.get("MAX_PAGE_SIZE"), default=100))
+
+def as_utc(value: datetime) -> datetime:
+    """UTC の datetime にする。SQLite などタイムゾーン無しで返る値は UTC とみなす。"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+# (並び替えの列の値, id)。新しい順では created_at、所要分数順では minutes
+Cursor = Tuple[Union[datetime, int], int]
+
+class SortOrder(NamedTuple):
+    """一覧の並び順。columns は (並び替えの列, Recipe.id) で、両方とも同じ向きに並べる。"""
+    label: str
+    columns: Tuple
+    descending: bool
+    parse_key: Callable[[str], Union[datetime, int]]
+
+# ?sort= の値 → 並び順。既定は "new"（それぞれ専用のインデックスで先頭から読める）
+SORT_ORDERS: Dict[str, SortOrder] = {
+    "new": SortOrder("新しい順", (Recipe.created_at, Recipe.id), True, datetime.fromisoformat),
+    "quick": SortOrder("早くできる順", (Recipe.minutes, Recipe.id), False, int),
+    "slow": SortOrder("時間のかかる順", (Recipe.minutes, Recipe.id), True, int),
+}
+DEFAULT_SORT = "new"
+
+class ListView(NamedTuple):
+    """一覧の絞り込み（MINUTES_BUCKETS のキー）と並び順（SORT_ORDERS のキー）。"""
+    minutes: Optional[str] = None
+    sort: str = DEFAULT_SORT
+
+    @property
+    def order(self) -> SortOrder:
+        return SORT_ORDERS[self.sort]
+
+    def url_args(self) -> Dict[str, Optional[str]]:
+        """url_for に渡す ?minutes= / ?sort=（既定値は省く）。"""
+        return {"minutes": self.minutes, "sort": self.sort if self.sort != DEFAULT_SORT else None}
+
+def parse_list_view(args) -> ListView:
+    """?minutes= / ?sort= を読む。知らない値は無視する（絞り込み無し・新しい順）。"""
+    minutes = args.get("minutes")
+    sort = args.get("sort")
+    return ListView(
+        minutes if minutes in MINUTES_BUCKETS else None,
+        sort if sort in SORT_ORDERS else DEFAULT_SORT,
+    )
+
+def encode_cursor(key: Union[datetime, int], recipe_id: int) -> str:
+    """(並び替えの列の値, id) を URL に載せられる不透明な文字列へ変換する。"""
+    value = key.isoformat() if isinstance(key, datetime) else str(key)
+    raw = f"{value}|{recipe_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(value: Optional[str], sort: str = DEFAULT_SORT) -> Optional[Cursor]:
+    """encode_cursor の逆変換。不正な値（別の並び順のカーソルを含む）は None（= 先頭ページ扱い）とする。"""
+    if not value:
+        return None
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        key, _, rid = raw.rpartition("|")
+        return SORT_ORDERS[sort].parse_key(key), int(rid)
+    except (ValueError, UnicodeError):
+        return None
+
+def parse_page_size(value: Optional[str]) -> int:
+    """?size= を 1〜MAX_PAGE_SIZE に丸める。未指定・不正値は PAGE_SIZE。"""
+    return min(_to_int_env(value, default=PAGE_SIZE), MAX_PAGE_SIZE)
+
+class RecipeRow(NamedTuple):
+    """
+    一覧表示用の軽量な行（ORM エンティティを生成せず、必要な列だけを持つ）。
+    フィールド順は LIST_COLUMNS と一致させること。
+    """
+    id: int
+    title: str
+    minutes: int
+    description: Optional[str]
+    created_at: datetime
+
+LIST_COLUMNS = (Recipe.id, Recipe.title, Recipe.minutes, Recipe.description, Recipe.created_at)
+
+def build_list_query(
+    before: Optional[Cursor] = None,
+    after: Optional[Cursor] = None,
+    size: int = PAGE_SIZE,
+    view: ListView = ListView(),
+):
+    """
+    一覧 1 ページ分の SELECT（次ページ判定用に size+1 件）を組み立てる。
+    before / after は表示順での前後（新しい順なら before が古い側）。
+    """
+    order = view.order
+    key = tuple_(*order.columns)
+    stmt = select(*LIST_COLUMNS)
+    if view.minutes is not None:
+        # 所要分数順なら (minutes, id) の範囲検索、新しい順なら区分の部分インデックスで読む
+        by_minutes = order.columns[0] is Recipe.minutes
+        stmt = stmt.where(*minutes_bucket_conditions(view.minutes, use_minutes_index=by_minutes))
+    # 表示順に読むなら forward。after（前のページ）は逆順で size+1 件取り、表示用に反転する
+    forward = after is None
+    cursor = before if forward else after
+    descending = order.descending == forward
+    if cursor is not None:
+        stmt = stmt.where(key < cursor if descending else key > cursor)
+    return stmt.order_by(*(c.desc() if descending else c.asc() for c in order.columns)).limit(size + 1)
+
+def _row_cursor(row: RecipeRow, view: ListView) -> str:
+    if view.order.columns[0] is Recipe.minutes:
+        return encode_cursor(row.minutes, row.id)
+    return encode_cursor(row.created_at, row.id)
+
+def fetch_recipe_page(
+    conn: Connection,
+    before: Optional[Cursor] = None,
+    after: Optional[Cursor] = None,
+    size: int = PAGE_SIZE,
+    view: ListView = ListView(),
+) -> Tuple[List[RecipeRow], Optional[str], Optional[str]]:
+    """
+    一覧から 1 ページ分を RecipeRow で取得する（ORM を経由しない）。
+    - before: 表示順でこのカーソルより後ろの行（新しい順なら「古いレシピ」リンク）
+    - after:  表示順でこのカーソルより前の行（新しい順なら「新しいレシピ」リンク）
+    戻り値: (rows, newer_cursor, older_cursor)。リンク不要な側は None。
+    newer / older は新しい順での呼び名で、他の並び順では「前へ」「次へ」にあたる。
+    """
+    stmt = build_list_query(before=before, after=after, size=size, view=view)
+    rows = [RecipeRow._make(r) for r in conn.execute(stmt)]
+    has_more = len(rows) > size
+    rows = rows[:size]
+
+    if after is not None:
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = before is not None, has_more
+
+    newer = _row_cursor(rows[0], view) if rows and has_newer else None
+    older = _row_cursor(rows[-1], view) if rows and has_older else None
+    return rows, newer, older
+
+class PageLinks(NamedTuple):
+    """ページ送りリンク用のカーソル（テンプレートでは pager として参照）。"""
+    newer_cursor: Optional[str]
+    older_cursor: Optional[str]
+
+# ==============================
+# ストリーミング描画
+# ==============================
+# STREAM_PAGES=1 のとき、一覧ページを Jinja の generate で少しずつ送出する。
+# <head> とフォームは DB の結果を待たずに届き、行はサーバサイドカーソルで
+# STREAM_YIELD_PER 件ずつ取り出すため、ページ全体をメモリに持たない。
+STREAM_PAGES = _to_bool_env(os.environ.get("STREAM_PAGES"), default=False)
+STREAM_YIELD_PER = _to_int_env(os.environ.get("STREAM_YIELD_PER"), default=100)
+STREAM_CHUNK_BYTES = _to_int_env(os.environ.get("STREAM_CHUNK_BYTES"), default=1024)
+
+class StreamingRecipeList:
+    """
+    一覧 1 ページ分を、テンプレートが走査する時点で DB から読み出すイテラブル。
+    走査し終えると newer_cursor / older_cursor が確定する（テンプレートでは
+    ページ送りが一覧より後ろにあるので、pager としてそのまま渡せる）。
+    DB エラー時は静かに打ち切り、ok が False のまま残る。
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Connection],
+        before: Optional[Cursor],
+        after: Optional[Cursor],
+        size: int,
+        view: ListView = ListView(),
+    ) -> None:
+        self.connect = connect
+        self.before = before
+        self.after = after
+        self.size = size
+        self.view = view
+        self.newer_cursor: Optional[str] = None
+        self.older_cursor: Optional[str] = None
+        self.ok = False
+
+    def __iter__(self) -> Iterator[RecipeRow]:
+        try:
+            with self.connect() as conn:
+                if self.after is not None:
+                    # 新しい側へのページは反転が必要なので通常どおり 1 ページ分を読む
+                    rows, self.newer_cursor, self.older_cursor = fetch_recipe_page(
+                        conn, after=self.after, size=self.size, view=self.view
+                    )
+                    yield from rows
+                else:
+                    yield from self._stream(conn)
+            self.ok = True
+        except Exception:
+            # 送出を始めた後はステータスを変えられないため、一覧をここで打ち切る
+            return
+
+    def _stream(self, conn: Connection) -> Iterator[RecipeRow]:
+        result = conn.execution_options(
+            stream_results=True, yield_per=STREAM_YIELD_PER
+        ).execute(build_list_query(before=self.before, size=self.size, view=self.view))
+        first: Optional[RecipeRow] = None
+        last: Optional[RecipeRow] = None
+        count = 0
+        has_more = False
+        for raw in result:
+            if count == self.size:
+                has_more = True
+                break
+            row = RecipeRow._make(raw)
+            if first is None:
+                first = row
+            last = row
+            count += 1
+            yield row
+        result.close()
+        if first is not None and self.before is not None:
+            self.newer_cursor = _row_cursor(first, self.view)
+        if last is not None and has_more:
+            self.older_cursor = _row_cursor(last, self.view)
+
+def _coalesce(chunks: Iterable[str], min_bytes: int) -> Iterator[str]:
+    """Jinja が細かく出す断片をまとめ、min_bytes 程度ごとに送出する。"""
+    buf: List[str] = []
+    size = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        size += len(chunk)
+        if size >= min_bytes:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+# ==============================
+# 描画済みページのキャッシュ（プロセス内）
+# ==============================
+class CachedPage(NamedTuple):
+    """
+    描画済み HTML と、それを生成した時点の検証子（ETag / Last-Modified）。
+    variants には圧縮済みの本文を Content-Encoding ごとに溜める（最初に要求されたときに作る）。
+    """
+    html: str
+    etag: str
+    last_modified: Optional[datetime]
+    variants: Dict[str, bytes]
+
+class PageCache:
+    """
+    描画済みページ（CachedPage）をキー（カーソル・件数）ごとに保持する LRU キャッシュ。
+    - ttl 秒を過ぎたエントリは捨てる（ttl=0 で無効）
+    - max_entries を超えたら古いものから捨てる
+    - 投稿のコミット時に clear() で全消去する（世代番号も進め、clear 前に
+      DB から読んだ古い結果が後から set されるのを防ぐ）。最後に clear() した時刻は cleared_at
+    gunicorn の各ワーカーは別プロセスなので、他ワーカーでの投稿は TTL 経過まで反映されない。
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self.cleared_at = float("-inf")
+        self._entries: "OrderedDict[Hashable, Tuple[float, CachedPage]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[CachedPage]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                PAGE_CACHE_REQUESTS.labels("miss").inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            PAGE_CACHE_REQUESTS.labels("hit").inc()
+            return entry[1]
+
+    def set(self, key: Hashable, page: CachedPage, generation: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, page)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self.cleared_at = time.monotonic()
+            self._entries.clear()
+
+    def cleared_within(self, seconds: float) -> bool:
+        """直近 seconds 秒以内に clear() されたか（このプロセスで書き込んだ直後か）。"""
+        return time.monotonic() - self.cleared_at < seconds
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+page_cache = PageCache(
+    ttl=_to_int_env(os.environ.get("PAGE_CACHE_TTL"), default=30, minimum=0),
+    max_entries=_to_int_env(os.environ.get("PAGE_CACHE_MAX_ENTRIES"), default=256, minimum=0),
+)
+
+# ==============================
+# 条件付き GET（ETag / Last-Modified）
+# ==============================
+# テンプレートや表示設定が変わったら ETag も変わるよう、版として混ぜ込む。
+_PAGE_VERSION = hashlib.sha1(
+    f"{PAGE_TEMPLATE}|{STYLESHEET_DIGEST}|{os.environ.get('DEBUG')}|{os.environ.get('PORT')}".encode("utf-8")
+).hexdigest()[:12]
+
+def fetch_list_validator(conn: Connection) -> Optional[Cursor]:
+    """
+    最新の created_at と最大の id を返す。どちらもインデックスの端を 1 件読むだけで済む。
+    過去の日時で入れた行（db_init.py --append など）は created_at の先頭を変えないが、id は必ず増える。
+    """
+    row = conn.execute(
+        select(Recipe.created_at, select(func.max(Recipe.id)).scalar_subquery())
+        .order_by(Recipe.created_at.desc(), Recipe.id.desc())
+        .limit(1)
+    ).first()
+    return (row[0], row[1]) if row else None
+
+def make_list_validator(
+    latest: Optional[Cursor], minutes_counts: Optional[Dict[str, int]] = None
+) -> Tuple[str, Optional[datetime]]:
+    """
+    (ETag, Last-Modified) を組み立てる。レシピが無い場合 Last-Modified は None。
+    区分ごとの件数（総数とファセット表示の元）も混ぜ込み、古い行の削除でも ETag が変わるようにする。
+    """
+    if latest is None:
+        return f"{_PAGE_VERSION}-empty", None
+    created_at, max_id = latest
+    created_at = as_utc(created_at)
+    counts = ".".join(map(str, minutes_counts.values())) if minutes_counts is not None else "none"
+    return f"{_PAGE_VERSION}-{max_id}-{counts}-{created_at.timestamp():.6f}", created_at
+
+def _is_not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    """If-None-Match を優先し、無ければ If-Modified-Since で判定する。"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    ims = request.if_modified_since
+    if ims is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= ims
+    return False
+
+def _conditional_response(
+    body,
+    etag: str,
+    last_modified: Optional[datetime],
+    variants: Optional[Dict[str, bytes]] = None,
+):
+    """
+    ETag / Last-Modified を付けたレスポンス。条件に合えば本文無しの 304 を返す。
+    body は文字列か、ストリーミング用の文字列イテレータ。
+    variants を渡すと、圧縮結果をそこから再利用・保存する（CachedPage.variants）。
+    """
+    if _is_not_modified(etag, last_modified):
+        resp = make_response("", 304)
+    elif isinstance(body, str):
+        resp = make_response(body)
+        compress_response(resp, variants)
+    else:
+        resp = app.response_class(stream_with_context(body), mimetype="text/html")
+    # 圧縮などで本文のバイト列が変わっても使えるよう弱い ETag にする
+    resp.set_etag(etag, weak=True)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    # キャッシュは保持してよいが、毎回サーバへ再検証させる
+    resp.cache_control.no_cache = True
+    return resp
+
+# ==============================
+# レスポンス圧縮（gzip / brotli）
+# ==============================
+# Accept-Encoding を見て br（brotli パッケージがあれば）か gzip で本文を圧縮する。
+# - COMPRESS_RESPONSES=0 で無効。COMPRESS_MIN_BYTES 未満の本文は圧縮しない
+# - キャッシュ済みページは圧縮結果も CachedPage.variants に残し、2 回目以降は圧縮し直さない
+# - ストリーミング中のレスポンス（STREAM_PAGES=1 の初回描画）は圧縮しない
+COMPRESS_RESPONSES = _to_bool_env(os.environ.get("COMPRESS_RESPONSES"), default=True)
+COMPRESS_MIN_BYTES = _to_int_env(os.environ.get("COMPRESS_MIN_BYTES"), default=512, minimum=0)
+COMPRESS_GZIP_LEVEL = min(_to_int_env(os.environ.get("COMPRESS_GZIP_LEVEL"), default=6), 9)
+COMPRESS_BROTLI_QUALITY = min(
+    _to_int_env(os.environ.get("COMPRESS_BROTLI_QUALITY"), default=5, minimum=0), 11
+)
+_COMPRESSIBLE_MIMETYPES = {
+    "text/html", "text/css", "text/csv", "text/plain", "application/json", "application/x-ndjson",
+}
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0: 同じ入力から常に同じバイト列にする
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+# 優先順（クライアントの q 値が同じなら先頭を選ぶ）
+_ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+try:
+    import brotli
+
+    _ENCODERS["br"] = lambda data: brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+except ImportError:  # brotli 未インストール環境では gzip のみ
+    pass
+_ENCODERS["gzip"] = _gzip
+
+def negotiate_encoding() -> Optional[str]:
+    """Accept-Encoding から使う圧縮形式を選ぶ。圧縮しない場合は None。"""
+    if not COMPRESS_RESPONSES:
+        return None
+    return request.accept_encodings.best_match(list(_ENCODERS))
+
+def compress_response(resp, variants: Optional[Dict[str, bytes]] = None):
+    """
+    圧縮できるレスポンスなら本文を置き換えて Content-Encoding を付ける。
+    variants があれば同じ形式の圧縮結果を再利用し、無ければ作って保存する。
+    """
+    if (
+        not COMPRESS_RESPONSES
+        or resp.direct_passthrough
+        or resp.is_streamed
+        or not 200 <= resp.status_code < 300
+        or resp.status_code in (204, 206)
+        or "Content-Encoding" in resp.headers
+        or resp.mimetype not in _COMPRESSIBLE_MIMETYPES
+    ):
+        return resp
+    # 圧縮するかどうかに関わらず、Accept-Encoding で本文が変わることを中間キャッシュに伝える
+    resp.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return resp
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return resp
+    encoded = variants.get(encoding) if variants is not None else None
+    if encoded is None:
+        encoded = _ENCODERS[encoding](data)
+        if variants is not None:
+            variants[encoding] = encoded
+    resp.set_data(encoded)
+    resp.headers["Content-Encoding"] = encoding
+    return resp
+
+@app.after_request
+def _compress_response(resp):
+    return compress_response(resp)
+
+def _empty_form_values() -> Dict[str, str]:
+    return {"title": "", "minutes": "", "description": ""}
+
+def _page_context(
+    errors: List[str],
+    recipes: Iterable[RecipeRow],
+    pager,
+    size: int,
+    form_values: dict,
+    search: Optional[dict] = None,
+    view: ListView = ListView(),
+    minutes_counts: Optional[Dict[str, int]] = None,
+) -> dict:
+    """
+    PAGE_TEMPLATE に渡す変数一式。search は検索結果表示時のみ（q, prev_page, next_page）。
+    view は一覧の絞り込み・並び順（ページ送りリンクに引き継ぐ）。
+    minutes_counts は区分ごとの件数（取得できなかったときは None で、件数を出さない）。
+    その合計を総数（recipe_total）として「全 N 件」に使う。
+    """
+    port = int(os.environ.get("PORT", "8000"))
+    debug = _to_bool_env(os.environ.get("DEBUG"), default=False)
+    return dict(
+        errors=errors,
+        recipes=recipes,
+        pager=pager,
+        debug=str(debug),
+        port=port,
+        db_ready=bool(DATABASE_URL),
+        form_values=form_values,
+        size=(size if size != PAGE_SIZE else None),
+        search=search,
+        view=view,
+        minutes_buckets=MINUTES_BUCKETS,
+        minutes_counts=minutes_counts,
+        recipe_total=(sum(minutes_counts.values()) if minutes_counts is not None else None),
+        sort_orders=SORT_ORDERS,
+    )
+
+def _render_page(**context) -> str:
+    """PAGE_TEMPLATE を描画し、描画時間をメトリクスに記録する。"""
+    started = time.perf_counter()
+    html = render_template(get_page_template(), **context)
+    RENDER_LATENCY.labels("page").observe(time.perf_counter() - started)
+    return html
+
+def _stream_page(
+    context: dict,
+    stream: StreamingRecipeList,
+    cache_key: Optional[Hashable],
+    cache_generation: int,
+    etag: str,
+    last_modified: Optional[datetime],
+) -> Iterator[str]:
+    """
+    PAGE_TEMPLATE を少しずつ送出し、最後まで成功したら全体をキャッシュへ入れる
+    （cache_key が None ならキャッシュしない）。
+    """
+    app.update_template_context(context)
+    parts: List[str] = []
+    started = time.perf_counter()
+    for chunk in _coalesce(get_page_template().generate(context), STREAM_CHUNK_BYTES):
+        parts.append(chunk)
+        yield chunk
+    # ストリーミング時は行の取得を挟むため、DB の時間も含む
+    RENDER_LATENCY.labels("page_stream").observe(time.perf_counter() - started)
+    if stream.ok and cache_key is not None:
+        page_cache.set(
+            cache_key, CachedPage("".join(parts), etag, last_modified, {}), cache_generation
+        )
+
+def validate_recipe_input(title: str, minutes_raw: str) -> Tuple[List[str], Optional[int]]:
+    """
+    タイトル・所要分数の入力チェック（フォーム投稿と一括インポートで共通）。
+    引数は strip 済みの文字列。戻り値: (エラーメッセージのリスト, 所要分数)
+    """
+    errors: List[str] = []
+    if not title:
+        errors.append("タイトルは必須です。")
+    if len(title) > 200:
+        errors.append("タイトルは200文字以内で入力してください。")
+
+    minutes_val: Optional[int] = None
+    if not minutes_raw:
+        errors.append("所要分数は必須です。")
+    else:
+        try:
+            minutes_val = int(minutes_raw)
+            if minutes_val < 1:
+                errors.append("所要分数は1以上の整数で入力してください。")
+        except ValueError:
+            errors.append("所要分数は整数で入力してください。")
+    return errors, minutes_val
+
+def _require_bearer(env_var: str, optional: bool = False) -> None:
+    """
+    環境変数 env_var のトークンで Authorization: Bearer を確認し、一致しなければ 401。
+    トークンが未設定なら 404（機能自体を無効にする）。optional=True なら未設定時は誰でも通す。
+    """
+    token = os.environ.get(env_var)
+    if not token:
+        if optional:
+            return
+        abort(404)
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+        abort(401)
+
+# 書き込んだクライアントは、この秒数だけ読み取りもプライマリへ送り、ページキャッシュも使わない
+# （レプリカ遅延と、投稿を受けていない別ワーカーに残ったキャッシュへの対策。レプリカが無くても付ける）
+PRIMARY_COOKIE = "read_primary"
+PRIMARY_STICKY_SECONDS = _to_int_env(os.environ.get("REPLICA_STICKY_SECONDS"), default=5)
+
+def _wants_primary() -> bool:
+    """直前に書き込んだクライアントか（read-your-writes のためプライマリから読む）。"""
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+def _mark_wrote(resp):
+    """書き込み成功のレスポンスに、しばらくキャッシュを通さずプライマリから読ませるための Cookie を付ける。"""
+    resp.set_cookie(
+        PRIMARY_COOKIE,
+        f"{time.time() + PRIMARY_STICKY_SECONDS:.0f}",
+        max_age=PRIMARY_STICKY_SECONDS,
+        httponly=True,
+        samesite="Lax",
+    )
+    return resp
+
+# ==============================
+# 二重送信の防止（冪等キー）
+# ==============================
+# フォームのトークン Cookie（API は Idempotency-Key ヘッダ）と入力内容から作ったキーを、
+# レシピの INSERT と同じトランザクションで idempotency_keys に記録する。
+# 同じキーの再送は保存せず、最初の送信と同じ結果（リダイレクト / 作成済みのレシピ）を返す。
+# 並行した再送は主キー違反で片方だけがコミットされる。プロセス内の LRU は DB 照会を省く近道。
+IDEMPOTENCY_TTL = _to_int_env(os.environ.get("IDEMPOTENCY_TTL"), default=24 * 3600)
+IDEMPOTENCY_PURGE_INTERVAL = _to_int_env(os.environ.get("IDEMPOTENCY_PURGE_INTERVAL"), default=300)
+IDEMPOTENCY_CACHE_SIZE = _to_int_env(os.environ.get("IDEMPOTENCY_CACHE_SIZE"), default=10000, minimum=0)
+FORM_TOKEN_COOKIE = "form_token"
+
+class IdempotencyRecord(NamedTuple):
+    """処理済みの投稿。recipe_id はグループコミット経由だと None。"""
+    recipe_id: Optional[int]
+
+def _issue_form_token() -> None:
+    """
+    このレスポンスに新しいフォームトークンの Cookie を付ける。トークンは HTML に埋め込まないので、
+    キャッシュ済みのページや 304 を返すときも閲覧者ごと・表示ごとに別の値になる。
+    """
+    token = secrets.token_urlsafe(16)
+
+    @after_this_request
+    def _set_form_token(resp):
+        resp.set_cookie(FORM_TOKEN_COOKIE, token, httponly=True, samesite="Lax")
+        return resp
+
+def make_idempotency_key(token: Optional[str], *values: object) -> Optional[str]:
+    """トークンと入力内容から記録用のキーを作る。トークンが無ければ None（重複判定しない）。"""
+    token = (token or "").strip()
+    if not token or len(token) > 255:
+        return None
+    digest = hashlib.sha256()
+    for value in (token, *values):
+        digest.update(("" if value is None else str(value)).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+class IdempotencyStore:
+    """
+    処理済みキーの照会。DB（idempotency_keys）が正で、プロセス内の LRU は近道。
+    - lookup(): 処理済みなら IdempotencyRecord、未処理・期限切れなら None
+    - remember(): コミット後にプロセス内へ記録する（DB への記録は書き込み側で行う）
+    - maybe_purge(): 期限切れの行を削除する（IDEMPOTENCY_PURGE_INTERVAL 秒に 1 回まで）
+    """
+
+    def __init__(self, ttl: int, max_entries: int, purge_interval: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._entries: "OrderedDict[str, Tuple[float, Optional[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def remember(self, key: Optional[str], recipe_id: Optional[int], ttl: Optional[float] = None) -> None:
+        if key is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), recipe_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def lookup(self, eng, key: str) -> Optional[IdempotencyRecord]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return IdempotencyRecord(entry[1])
+                del self._entries[key]
+        with eng.connect() as conn:
+            row = conn.execute(
+                select(IdempotencyKey.recipe_id, IdempotencyKey.created_at).where(IdempotencyKey.key == key)
+            ).first()
+        if row is None:
+            return None
+        remaining = self.ttl - (datetime.now(timezone.utc) - as_utc(row.created_at)).total_seconds()
+        if remaining <= 0:
+            # 期限切れ。消しておかないと同じキーの INSERT が主キー違反になる
+            with eng.begin() as conn:
+                conn.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            return None
+        self.remember(key, row.recipe_id, ttl=remaining)
+        return IdempotencyRecord(row.recipe_id)
+
+    def maybe_purge(self, eng) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        try:
+            with eng.begin() as conn:
+                conn.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+        except sa_exc.SQLAlchemyError:
+            logging.getLogger("recipe.idempotency").warning("failed to purge expired keys", exc_info=True)
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_TTL, IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_PURGE_INTERVAL)
+
+def create_recipe(
+    eng,
+    title: str,
+    minutes: int,
+    description: Optional[str],
+    idempotency_key: Optional[str] = None,
+) -> RecipeRow:
+    """
+    1 件保存してコミットし、保存後の行を返す（描画済みページのキャッシュも破棄する）。
+    idempotency_key があれば同じトランザクションで記録する。処理済みのキーなら IntegrityError。
+    """
+    # --- 保存処理（SQLAlchemy 2系 / コンテキストマネージャで明示コミット） ---
+    with Session(eng) as session:
+        item = Recipe(title=title, minutes=minutes, description=description)
+        session.add(item)
+        if idempotency_key is not None:
+            session.flush()  # item.id を確定させる
+            session.add(IdempotencyKey(key=idempotency_key, recipe_id=item.id))
+        session.commit()
+        row = RecipeRow(item.id, item.title, item.minutes, item.description, item.created_at)
+    if idempotency_key is not None:
+        idempotency_store.remember(idempotency_key, row.id)
+        idempotency_store.maybe_purge(eng)
+    # 一覧が変わったので描画済みページを破棄する
+    page_cache.clear()
+    return row
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -185,12 +1783,10 @@ def index():
     GET: 一覧 + フォーム表示
     POST: バリデーション → 保存（成功時 PRG でリダイレクト）/ 失敗時は同ページにエラー表示
     """
+    engine = get_engine()
     errors: List[str] = []
-    form_values = {
-        "title": "",
-        "minutes": "",
-        "description": "",
-    }
+    form_values = _empty_form_values()
+    keep_form_token = False
 
     if request.method == "POST":
         title = (request.form.get("title") or "").strip()
@@ -202,63 +1798,874 @@ def index():
         form_values["description"] = description
 
         # --- 入力バリデーション（日本語メッセージ） ---
-        if not title:
-            errors.append("タイトルは必須です。")
-        if len(title) > 200:
-            errors.append("タイトルは200文字以内で入力してください。")
-
-        minutes_val: Optional[int] = None
-        if not minutes_raw:
-            errors.append("所要分数は必須です。")
-        else:
-            try:
-                minutes_val = int(minutes_raw)
-                if minutes_val < 1:
-                    errors.append("所要分数は1以上の整数で入力してください。")
-            except ValueError:
-                errors.append("所要分数は整数で入力してください。")
+        input_errors, minutes_val = validate_recipe_input(title, minutes_raw)
+        errors.extend(input_errors)
 
         # DB 未設定のときは保存不可だが、ユーザーに案内する
         if engine is None:
             errors.append("データベースが未設定のため保存できません。DATABASE_URL を設定してください。")
 
         if not errors and engine is not None and minutes_val is not None:
-            # --- 保存処理（SQLAlchemy 2系 / コンテキストマネージャで明示コミット） ---
+            idempotency_key = make_idempotency_key(
+                request.cookies.get(FORM_TOKEN_COOKIE), "form", title, minutes_val, description
+            )
             try:
-                with Session(engine) as session:
-                    item = Recipe(title=title, minutes=minutes_val, description=description or None)
-                    session.add(item)
-                    session.commit()
+                if idempotency_key is not None and idempotency_store.lookup(engine, idempotency_key) is not None:
+                    # 二重送信: 保存済みなので、最初の送信と同じくリダイレクトだけ返す
+                    return _mark_wrote(redirect(url_for("index")))
+                group_writer = get_group_writer()
+                if group_writer is not None:
+                    # グループコミット: 自分の行がコミットされるまで待つ
+                    future = group_writer.submit(
+                        {"title": title, "minutes": minutes_val, "description": description or None},
+                        idempotency_key,
+                    )
+                    try:
+                        future.result(timeout=WRITE_BATCH_TIMEOUT)
+                    except FutureTimeoutError:
+                        # まだキューにあれば取り消す。書き込み中で取り消せない場合は後からコミットされうるので、
+                        # 再送信が重複として弾かれるようにフォームトークンを変えずに返す
+                        if not future.cancel():
+                            keep_form_token = True
+                        raise
+                else:
+                    create_recipe(engine, title, minutes_val, description or None, idempotency_key)
                 # 成功時は PRG（Post/Redirect/Get）
-                return redirect(url_for("index"))
+                return _mark_wrote(redirect(url_for("index")))
+            except sa_exc.IntegrityError:
+                # 同じキーの送信が並行して先にコミットされた場合も、保存済みとして扱う
+                try:
+                    saved = (
+                        idempotency_key is not None
+                        and idempotency_store.lookup(engine, idempotency_key) is not None
+                    )
+                except Exception:
+                    saved = False
+                if saved:
+                    return _mark_wrote(redirect(url_for("index")))
+                errors.append("保存中にエラーが発生しました。入力内容を確認のうえ、再度お試しください。")
             except Exception as e:
                 # 例外時は簡易エラーメッセージ（本番ではロギング推奨）
                 errors.append("保存中にエラーが発生しました。入力内容を確認のうえ、再度お試しください。")
                 # 具体的な例外内容は学習用にコメントアウト（必要に応じて表示可）
                 # errors.append(str(e))
 
-    # --- 一覧表示（新しい順） ---
-    recipes: List[Recipe] = []
+    # フォームを表示するレスポンスには、次の投稿用のトークンを付ける
+    if not keep_form_token:
+        _issue_form_token()
+
+    # --- 一覧表示（既定は新しい順・カーソルでページング） ---
+    recipes: List[RecipeRow] = []
+    newer_cursor: Optional[str] = None
+    older_cursor: Optional[str] = None
+    view = parse_list_view(request.args)
+    minutes_counts: Optional[Dict[str, int]] = None
+    before = decode_cursor(request.args.get("before"), view.sort)
+    after = decode_cursor(request.args.get("after"), view.sort)
+    size = parse_page_size(request.args.get("size"))
+    streaming = STREAM_PAGES and request.method == "GET" and engine is not None
+    list_ok = False
+    cache_key = (request.args.get("before"), request.args.get("after"), size, view)
+    cache_generation = page_cache.generation
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+    # 直前に自分が投稿した場合（PRG のリダイレクト先など）はプライマリから読む。
+    # キャッシュには他のクライアントがレプリカから読んだ古いページが入りうるので使わない
+    wants_primary = _wants_primary()
+    use_primary = request.method == "POST" or wants_primary
+    if request.method == "GET" and engine is not None and not wants_primary:
+        cached = page_cache.get(cache_key)
+        if cached is not None:
+            return _conditional_response(
+                cached.html, cached.etag, cached.last_modified, variants=cached.variants
+            )
+    # レプリカから読んだページは、このプロセスでの書き込み直後（PRIMARY_STICKY_SECONDS 以内）なら
+    # まだ書き込みが反映されていない可能性があるのでキャッシュしない
+    cacheable = (
+        use_primary
+        or get_replica_router() is None
+        or not page_cache.cleared_within(PRIMARY_STICKY_SECONDS)
+    )
     if engine is not None:
         try:
-            with Session(engine) as session:
-                recipes = session.query(Recipe).order_by(Recipe.created_at.desc(), Recipe.id.desc()).all()
+            with connect_for_read(use_primary) as conn:
+                minutes_counts = try_fetch_minutes_counts(conn)
+                if request.method == "GET":
+                    # 一覧クエリと描画の前に検証子だけを調べ、変化が無ければ 304 で返す
+                    etag, last_modified = make_list_validator(
+                        fetch_list_validator(conn), minutes_counts
+                    )
+                    if _is_not_modified(etag, last_modified):
+                        return _conditional_response("", etag, last_modified)
+                if not streaming:
+                    recipes, newer_cursor, older_cursor = fetch_recipe_page(
+                        conn, before=before, after=after, size=size, view=view
+                    )
+            list_ok = True
         except Exception:
             # DB が未初期化／接続失敗時などは静かに空リスト表示
             recipes = []
+            streaming = False
+
+    if streaming and etag is not None:
+        stream = StreamingRecipeList(
+            lambda: connect_for_read(use_primary), before=before, after=after, size=size, view=view
+        )
+        context = _page_context(
+            errors, stream, stream, size, form_values, view=view, minutes_counts=minutes_counts
+        )
+        return _conditional_response(
+            _stream_page(
+                context, stream, cache_key if cacheable else None, cache_generation, etag, last_modified
+            ),
+            etag,
+            last_modified,
+        )
 
     # ページ描画
-    port = int(os.environ.get("PORT", "8000"))
-    debug = _to_bool_env(os.environ.get("DEBUG"), default=False)
-    return render_template_string(
-        PAGE_TEMPLATE,
-        errors=errors,
-        recipes=recipes,
-        debug=str(debug),
-        port=port,
-        db_ready=(engine is not None),
-        form_values=form_values,
+    html = _render_page(
+        **_page_context(
+            errors, recipes, PageLinks(newer_cursor, older_cursor), size, form_values,
+            view=view, minutes_counts=minutes_counts,
+        )
+    )
+    # DB エラーで空表示になったページや、入力エラー付きのページはキャッシュしない
+    if request.method == "GET" and list_ok and etag is not None:
+        page = CachedPage(html, etag, last_modified, {})
+        if cacheable:
+            page_cache.set(cache_key, page, cache_generation)
+        return _conditional_response(html, etag, last_modified, variants=page.variants)
+    return html
+
+# ==============================
+# 全文検索（/search）
+# ==============================
+SEARCH_MAX_QUERY_LENGTH = 100
+SEARCH_MAX_PAGE = 50
+
+_PG_SEARCH_SQL = """
+SELECT id, title, minutes, description, created_at FROM recipes
+WHERE recipe_grams(coalesce(title, '') || ' ' || coalesce(description, '')) @@ recipe_grams_query(:q)
+ORDER BY recipe_grams(title) @@ recipe_grams_query(:q) DESC, created_at DESC, id DESC
+LIMIT :limit OFFSET :offset
+"""
+
+_SQLITE_SEARCH_SQL = """
+SELECT r.id, r.title, r.minutes, r.description, r.created_at
+FROM recipes_search JOIN recipes AS r ON r.id = recipes_search.rowid
+WHERE recipes_search MATCH :q
+ORDER BY bm25(recipes_search, 2.0, 1.0), r.created_at DESC, r.id DESC
+LIMIT :limit OFFSET :offset
+"""
+
+def search_recipes(conn: Connection, q: str, page: int = 1, size: int = PAGE_SIZE) -> Tuple[List[RecipeRow], bool]:
+    """
+    タイトル・説明をバイグラム索引で検索し、関連度順（タイトル一致を優先）に 1 ページ分返す。
+    戻り値: (rows, 次ページがあるか)
+    """
+    params = {"limit": size + 1, "offset": (page - 1) * size}
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        stmt = text(_PG_SEARCH_SQL).columns(*LIST_COLUMNS)
+        params["q"] = q
+    elif dialect == "sqlite":
+        match = _sqlite_match_query(q)
+        if not match:
+            return [], False
+        stmt = text(_SQLITE_SEARCH_SQL).columns(*LIST_COLUMNS)
+        params["q"] = match
+    else:
+        # 索引の無い DB では部分一致で代用する
+        pattern = f"%{q}%"
+        stmt = (
+            select(*LIST_COLUMNS)
+            .where(Recipe.title.ilike(pattern) | Recipe.description.ilike(pattern))
+            .order_by(Recipe.created_at.desc(), Recipe.id.desc())
+            .limit(params["limit"]).offset(params["offset"])
+        )
+        params = {}
+    rows = [RecipeRow._make(r) for r in conn.execute(stmt, params)]
+    return rows[:size], len(rows) > size
+
+@app.route("/search")
+def search():
+    """GET ?q=...&page=N: 検索結果を一覧と同じページに表示する（空の検索語は一覧へ戻す）。"""
+    engine = get_engine()
+    q = (request.args.get("q") or "").strip()[:SEARCH_MAX_QUERY_LENGTH]
+    if not q:
+        return redirect(url_for("index"))
+    page = min(_to_int_env(request.args.get("page"), default=1), SEARCH_MAX_PAGE)
+    size = parse_page_size(request.args.get("size"))
+
+    recipes: List[RecipeRow] = []
+    has_next = False
+    if engine is not None:
+        try:
+            with connect_for_read(_wants_primary()) as conn:
+                recipes, has_next = search_recipes(conn, q, page=page, size=size)
+        except Exception:
+            recipes = []
+
+    search_state = {
+        "q": q,
+        "prev_page": page - 1 if page > 1 else None,
+        "next_page": page + 1 if has_next and page < SEARCH_MAX_PAGE else None,
+    }
+    _issue_form_token()
+    return _render_page(
+        **_page_context([], recipes, PageLinks(None, None), size, _empty_form_values(), search=search_state)
+    )
+
+# ==============================
+# 一括インポート（CSV / NDJSON）
+# ==============================
+# 列は title, minutes, description（description は任意）。入力チェックはフォーム投稿と同じ。
+# PostgreSQL では COPY、それ以外（SQLite など）では複数行 INSERT でまとめて書き込む。
+IMPORT_BATCH_SIZE = _to_int_env(os.environ.get("IMPORT_BATCH_SIZE"), default=5000)
+IMPORT_MAX_REPORTED_ERRORS = 1000
+# 複数行 INSERT は 1 文あたりのプレースホルダ数に上限がある（SQLite は 32766）
+_INSERT_VALUES_ROWS = 500
+_IMPORT_COLUMNS = ("title", "minutes", "description")
+
+@dataclass
+class ImportReport:
+    """一括インポートの結果。errors は先頭 IMPORT_MAX_REPORTED_ERRORS 件のみ保持する。"""
+    inserted: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    errors: List[Dict[str, object]] = field(default_factory=list)
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.inserted / self.seconds if self.seconds > 0 else 0.0
+
+    def add_error(self, line: int, messages: List[str]) -> None:
+        self.rejected += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": messages})
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+            "errors": self.errors,
+        }
+
+# (行番号, 列の dict) または (行番号, 解析エラーメッセージ)
+ImportRecord = Tuple[int, object]
+
+def iter_csv_records(stream: TextIO) -> Iterator[ImportRecord]:
+    """ヘッダ付き CSV を 1 行ずつ dict にする。行番号はファイル上の行（ヘッダが 1 行目）。"""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+def iter_ndjson_records(stream: TextIO) -> Iterator[ImportRecord]:
+    """1 行 1 オブジェクトの JSON を dict にする。空行は読み飛ばす。"""
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, "JSON として解析できません。"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "JSON オブジェクトではありません。"
+            continue
+        yield line_no, record
+
+def _cell(record: dict, key: str) -> str:
+    value = record.get(key)
+    return "" if value is None else str(value).strip()
+
+def _copy_rows(conn: Connection, rows: List[Dict[str, object]]) -> None:
+    """PostgreSQL の COPY FROM STDIN で rows を書き込む（psycopg2 の copy_expert）。"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([row["title"], row["minutes"], row["description"]])
+    buf.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY recipes (title, minutes, description) FROM STDIN WITH (FORMAT csv)", buf
+        )
+    finally:
+        cursor.close()
+
+def _insert_rows(conn: Connection, rows: List[Dict[str, object]]) -> None:
+    """複数行 INSERT ... VALUES (...), (...) でまとめて書き込む。"""
+    for start in range(0, len(rows), _INSERT_VALUES_ROWS):
+        conn.execute(insert(Recipe).values(rows[start:start + _INSERT_VALUES_ROWS]))
+
+def import_recipes(eng, records: Iterable[ImportRecord], batch_size: int = IMPORT_BATCH_SIZE) -> ImportReport:
+    """
+    records を検証しながら batch_size 件ずつ書き込む。
+    不正な行は書き込まずに report.errors へ記録し、残りの行は取り込む。
+    全体を 1 トランザクションで行うので、DB エラー時は何も書き込まれない。
+    """
+    report = ImportReport()
+    write = _copy_rows if eng.dialect.name == "postgresql" else _insert_rows
+    started = time.perf_counter()
+    batch: List[Dict[str, object]] = []
+    with eng.begin() as conn:
+        for line_no, record in records:
+            if not isinstance(record, dict):
+                report.add_error(line_no, [str(record)])
+                continue
+            title = _cell(record, "title")
+            description = _cell(record, "description")
+            errors, minutes_val = validate_recipe_input(title, _cell(record, "minutes"))
+            if errors:
+                report.add_error(line_no, errors)
+                continue
+            batch.append({"title": title, "minutes": minutes_val, "description": description or None})
+            if len(batch) >= batch_size:
+                write(conn, batch)
+                report.inserted += len(batch)
+                batch = []
+        if batch:
+            write(conn, batch)
+            report.inserted += len(batch)
+    report.seconds = time.perf_counter() - started
+    if report.inserted:
+        page_cache.clear()
+    return report
+
+def _detect_import_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    """拡張子・Content-Type から "csv" / "ndjson" を推定する（既定は csv）。"""
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in ctype or "jsonlines" in ctype:
+        return "ndjson"
+    return "csv"
+
+def _open_import_records(stream: BinaryIO, fmt: str) -> Iterator[ImportRecord]:
+    # utf-8-sig: Excel が付ける BOM を読み飛ばす
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "ndjson":
+        return iter_ndjson_records(text_stream)
+    return iter_csv_records(text_stream)
+
+@app.route("/import", methods=["POST"])
+def import_endpoint():
+    """
+    一括インポート API。IMPORT_TOKEN が未設定なら無効（404）。
+    Authorization: Bearer <IMPORT_TOKEN> が必要。
+    multipart の file フィールド、またはリクエスト本文そのものを受け付ける。
+    形式は ?format=csv|ndjson、無ければファイル名・Content-Type から推定する。
+    """
+    engine = get_engine()
+    _require_bearer("IMPORT_TOKEN")
+    if engine is None:
+        return jsonify({"error": "DATABASE_URL が未設定です。"}), 503
+
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename, content_type = upload.stream, upload.filename, upload.mimetype
+    else:
+        stream, filename, content_type = request.stream, None, request.mimetype
+    fmt = request.args.get("format") or _detect_import_format(filename, content_type)
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format は csv か ndjson を指定してください。"}), 400
+
+    try:
+        report = import_recipes(engine, _open_import_records(stream, fmt))
+    except (UnicodeDecodeError, csv.Error):
+        return jsonify({"error": "ファイルを読み取れません（UTF-8 の CSV / NDJSON を指定してください）。"}), 400
+    except Exception:
+        return jsonify({"error": "取り込み中にエラーが発生しました。何も保存されていません。"}), 500
+    return _mark_wrote(jsonify(report.to_dict()))
+
+# ==============================
+# JSON API（/api/recipes）
+# ==============================
+# orjson があれば使い、無ければ標準の json にフォールバックする。
+try:
+    import orjson
+
+    def _json_dumps(payload: object) -> bytes:
+        return orjson.dumps(payload)
+except ImportError:  # orjson 未インストール環境
+    def _json_dumps(payload: object) -> bytes:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def recipe_to_dict(row: RecipeRow) -> Dict[str, object]:
+    """API 用の dict。日時は ISO 8601 文字列にする（エンコーダに依存しないように）。"""
+    return {
+        "id": row.id,
+        "title": row.title,
+        "minutes": row.minutes,
+        "description": row.description,
+        "created_at": row.created_at.isoformat(),
+    }
+
+def _json_response(payload: object, status: int = 200):
+    return app.response_class(_json_dumps(payload), status=status, mimetype="application/json")
+
+def _json_error(status: int, message: str, errors: Optional[List[str]] = None):
+    payload: Dict[str, object] = {"error": message}
+    if errors:
+        payload["errors"] = errors
+    return _json_response(payload, status)
+
+@app.route("/api/recipes", methods=["GET"])
+def api_list_recipes():
+    """
+    一覧（既定は新しい順）。?before= / ?after= / ?size= / ?minutes= / ?sort= は HTML の一覧と同じ。
+    """
+    engine = get_engine()
+    if engine is None:
+        return _json_error(503, "DATABASE_URL が未設定です。")
+    view = parse_list_view(request.args)
+    with connect_for_read(_wants_primary()) as conn:
+        rows, newer, older = fetch_recipe_page(
+            conn,
+            before=decode_cursor(request.args.get("before"), view.sort),
+            after=decode_cursor(request.args.get("after"), view.sort),
+            size=parse_page_size(request.args.get("size")),
+            view=view,
+        )
+        minutes_counts = try_fetch_minutes_counts(conn)
+    return _json_response({
+        "items": [recipe_to_dict(r) for r in rows],
+        "newer_cursor": newer,
+        "older_cursor": older,
+        "total": sum(minutes_counts.values()) if minutes_counts is not None else None,
+        "facets": {"minutes": minutes_counts},
+    })
+
+@app.route("/api/recipes/<int:recipe_id>", methods=["GET"])
+def api_get_recipe(recipe_id: int):
+    engine = get_engine()
+    if engine is None:
+        return _json_error(503, "DATABASE_URL が未設定です。")
+    with connect_for_read(_wants_primary()) as conn:
+        row = conn.execute(select(*LIST_COLUMNS).where(Recipe.id == recipe_id)).first()
+    if row is None:
+        return _json_error(404, "レシピが見つかりません。")
+    return _json_response(recipe_to_dict(RecipeRow._make(row)))
+
+@app.route("/api/recipes", methods=["POST"])
+def api_create_recipe():
+    """JSON {"title", "minutes", "description"} で登録する。入力チェックはフォーム投稿と同じ。"""
+    engine = get_engine()
+    if engine is None:
+        return _json_error(503, "DATABASE_URL が未設定です。")
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return _json_error(400, "JSON オブジェクトを送信してください。")
+    title = _cell(data, "title")
+    description = _cell(data, "description")
+    errors, minutes_val = validate_recipe_input(title, _cell(data, "minutes"))
+    if errors or minutes_val is None:
+        return _json_error(400, "入力エラーがあります。", errors)
+    idempotency_key = make_idempotency_key(
+        request.headers.get("Idempotency-Key"), "api", title, minutes_val, description
+    )
+    row = None
+    if idempotency_key is not None:
+        row = _replay_created_recipe(engine, idempotency_key)
+    if row is None:
+        try:
+            row = create_recipe(engine, title, minutes_val, description or None, idempotency_key)
+        except sa_exc.IntegrityError:
+            # 同じ Idempotency-Key の要求が並行して先にコミットされた
+            row = _replay_created_recipe(engine, idempotency_key) if idempotency_key else None
+            if row is None:
+                raise
+    resp = _json_response(recipe_to_dict(row), 201)
+    resp.headers["Location"] = url_for("api_get_recipe", recipe_id=row.id)
+    return _mark_wrote(resp)
+
+def _replay_created_recipe(eng, idempotency_key: str) -> Optional[RecipeRow]:
+    """処理済みの Idempotency-Key なら、そのとき作成したレシピを返す。"""
+    record = idempotency_store.lookup(eng, idempotency_key)
+    if record is None or record.recipe_id is None:
+        return None
+    with eng.connect() as conn:
+        row = conn.execute(select(*LIST_COLUMNS).where(Recipe.id == record.recipe_id)).first()
+    return RecipeRow._make(row) if row is not None else None
+
+# ==============================
+# 一括エクスポート（CSV / NDJSON）
+# ==============================
+# 全件を .all() で読まず、EXPORT_BATCH_SIZE 件ずつ取り出して書き出す（メモリ使用量は件数に依存しない）。
+# PostgreSQL（psycopg2）では yield_per によりサーバサイドカーソル（名前付きカーソル）で読む。
+# 並びは古い順（created_at, id）。since だけなら created_at >= since（境界の行も含む）。
+# 差分エクスポートでは前回の最後の行の created_at を since、id を after_id に渡すと、
+# (created_at, id) がそれより後の行だけを返す（同じ時刻の行も重複・欠落しない）。
+# CSV の列はインポートと同じ名前なので、そのまま import-recipes に戻せる（id / created_at は無視される）。
+EXPORT_BATCH_SIZE = _to_int_env(os.environ.get("EXPORT_BATCH_SIZE"), default=1000)
+_EXPORT_COLUMNS = ("id", "title", "minutes", "description", "created_at")
+_EXPORT_MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+@dataclass
+class ExportReport:
+    """一括エクスポートの結果（件数と所要時間）。last は最後に書き出した行（次回の差分の起点）。"""
+    exported: int = 0
+    seconds: float = 0.0
+    last: Optional[RecipeRow] = None
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.exported / self.seconds if self.seconds > 0 else 0.0
+
+def parse_since(value: Optional[str]) -> Optional[datetime]:
+    """
+    since（ISO 8601 の日付または日時）を UTC の datetime にする。
+    タイムゾーンが無ければ UTC とみなす。解釈できなければ ValueError。
+    """
+    if not value:
+        return None
+    return as_utc(datetime.fromisoformat(value.strip().replace("Z", "+00:00")))
+
+def iter_export_batches(
+    conn: Connection,
+    since: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[List[RecipeRow]]:
+    """
+    created_at >= since（after_id もあれば (created_at, id) > (since, after_id)）のレシピを
+    古い順に batch_size 件ずつ返す。
+    """
+    stmt = select(*LIST_COLUMNS).order_by(Recipe.created_at.asc(), Recipe.id.asc())
+    if since is not None and after_id is not None:
+        stmt = stmt.where(tuple_(Recipe.created_at, Recipe.id) > (since, after_id))
+    elif since is not None:
+        stmt = stmt.where(Recipe.created_at >= since)
+    result = conn.execution_options(yield_per=batch_size).execute(stmt)
+    for partition in result.partitions():
+        yield [RecipeRow._make(row) for row in partition]
+
+def _csv_chunk(rows: List[RecipeRow], header: bool = False) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(_EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([row.id, row.title, row.minutes, row.description, row.created_at.isoformat()])
+    return buf.getvalue().encode("utf-8")
+
+def _ndjson_chunk(rows: List[RecipeRow]) -> bytes:
+    return b"".join(_json_dumps(recipe_to_dict(row)) + b"\n" for row in rows)
+
+def export_recipes(
+    conn: Connection,
+    fmt: str,
+    report: ExportReport,
+    since: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """
+    CSV / NDJSON をバッチごとのバイト列として返す。件数と所要時間は report に書き込む
+    （最後まで読み切った時点で確定する）。CSV は 0 件でもヘッダ行を出す。
+    """
+    started = time.perf_counter()
+    if fmt == "csv":
+        yield _csv_chunk([], header=True)
+    for rows in iter_export_batches(conn, since=since, after_id=after_id, batch_size=batch_size):
+        yield _csv_chunk(rows) if fmt == "csv" else _ndjson_chunk(rows)
+        report.exported += len(rows)
+        report.last = rows[-1]
+        report.seconds = time.perf_counter() - started
+    report.seconds = time.perf_counter() - started
+
+@app.route("/export", methods=["GET"])
+def export_endpoint():
+    """
+    一括エクスポート API。EXPORT_TOKEN が未設定なら無効（404）。
+    Authorization: Bearer <EXPORT_TOKEN> が必要。
+    ?format=csv|ndjson（既定 csv）、?since= で created_at の下限を指定できる
+    （?after_id= も付けると (created_at, id) がそれより後の行だけ）。
+    本文はストリーミングで返し、件数と所要時間は最後にメトリクス（recipe_export_*）へ記録する。
+    """
+    _require_bearer("EXPORT_TOKEN")
+    if get_engine() is None:
+        return jsonify({"error": "DATABASE_URL が未設定です。"}), 503
+    fmt = request.args.get("format", "csv")
+    if fmt not in _EXPORT_MIMETYPES:
+        return jsonify({"error": "format は csv か ndjson を指定してください。"}), 400
+    try:
+        since = parse_since(request.args.get("since"))
+    except ValueError:
+        return jsonify({"error": "since は ISO 8601 の日付または日時で指定してください。"}), 400
+    after_id = request.args.get("after_id", type=int)
+    if after_id is not None and since is None:
+        return jsonify({"error": "after_id は since と一緒に指定してください。"}), 400
+
+    def generate() -> Iterator[bytes]:
+        report = ExportReport()
+        # 集計用の長い読み取りなので、レプリカがあればそちらで読む
+        with connect_for_read() as conn:
+            yield from export_recipes(conn, fmt, report, since=since, after_id=after_id)
+        EXPORT_ROWS.labels(fmt).inc(report.exported)
+        EXPORT_DURATION.labels(fmt).observe(report.seconds)
+
+    resp = app.response_class(stream_with_context(generate()), mimetype=_EXPORT_MIMETYPES[fmt])
+    resp.headers["Content-Disposition"] = f"attachment; filename=recipes.{fmt}"
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+# ==============================
+# 投稿のグループコミット（任意）
+# ==============================
+# WRITE_BATCHING=1 のとき、フォーム投稿はキューに積まれ、バックグラウンドスレッドが
+# WRITE_BATCH_INTERVAL_MS ミリ秒ごと（または WRITE_BATCH_MAX_ROWS 件たまった時点）に
+# 1 トランザクションの複数行 INSERT でまとめてコミットする。
+# リクエスト側は自分の行のコミット完了を待ってから PRG でリダイレクトする。
+WRITE_BATCHING = _to_bool_env(os.environ.get("WRITE_BATCHING"), default=False)
+WRITE_BATCH_INTERVAL_MS = _to_int_env(os.environ.get("WRITE_BATCH_INTERVAL_MS"), default=20)
+WRITE_BATCH_MAX_ROWS = _to_int_env(os.environ.get("WRITE_BATCH_MAX_ROWS"), default=100)
+WRITE_BATCH_TIMEOUT = _to_int_env(os.environ.get("WRITE_BATCH_TIMEOUT"), default=10)
+
+class GroupCommitWriter:
+    """
+    投稿をまとめてコミットする書き込みキュー。submit() は Future を返し、
+    コミット成功で None、失敗で例外が設定される。
+    まとめた INSERT が失敗した場合は 1 件ずつ入れ直し、失敗した行だけを例外にする。
+    スレッドはプロセスごとに初回 submit 時に起動する（gunicorn の fork 後でも動くように）。
+    """
+
+    def __init__(self, eng, interval_ms: int, max_rows: int) -> None:
+        self.eng = eng
+        self.interval = interval_ms / 1000.0
+        self.max_rows = max_rows
+        self._queue: "queue.Queue[Tuple[Dict[str, object], Optional[str], Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+
+    def submit(self, row: Dict[str, object], idempotency_key: Optional[str] = None) -> Future:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((row, idempotency_key, future))
+        return future
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="group-commit", daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _write(self, conn: Connection, batch: List[Tuple[Dict[str, object], Optional[str], Future]]) -> None:
+        _insert_rows(conn, [row for row, _, _ in batch])
+        # 冪等キーも同じトランザクションで記録する（複数行 INSERT では id が分からないので NULL）
+        keys = [{"key": key} for _, key, _ in batch if key is not None]
+        if keys:
+            conn.execute(insert(IdempotencyKey), keys)
+
+    def _flush(self, batch: List[Tuple[Dict[str, object], Optional[str], Future]]) -> None:
+        # 待ち時間切れで取り消された投稿は書かない（以降は取り消せない状態になる）
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            with self.eng.begin() as conn:
+                self._write(conn, batch)
+        except Exception:
+            # どの行が原因か分からないので 1 件ずつ入れ直す
+            for item in batch:
+                future = item[2]
+                try:
+                    with self.eng.begin() as conn:
+                        self._write(conn, [item])
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    idempotency_store.remember(item[1], None)
+                    future.set_result(None)
+        else:
+            for _, key, future in batch:
+                idempotency_store.remember(key, None)
+                future.set_result(None)
+        page_cache.clear()
+        idempotency_store.maybe_purge(self.eng)
+
+_group_writer: Optional[GroupCommitWriter] = None
+
+def get_group_writer() -> Optional[GroupCommitWriter]:
+    """WRITE_BATCHING が有効なときの書き込みキュー（初回呼び出し時に生成）。"""
+    global _group_writer
+    if _group_writer is None and WRITE_BATCHING:
+        eng = get_engine()
+        if eng is not None:
+            with _engine_lock:
+                if _group_writer is None:
+                    _group_writer = GroupCommitWriter(eng, WRITE_BATCH_INTERVAL_MS, WRITE_BATCH_MAX_ROWS)
+    return _group_writer
+
+# ==============================
+# リクエスト計測と /metrics
+# ==============================
+@app.before_request
+def _start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(resp):
+    started = g.pop("request_started", None)
+    if started is not None:
+        # ルーティングされなかった URL はまとめる（ラベルの種類が増えないように）
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_LATENCY.labels(route, request.method).observe(time.perf_counter() - started)
+        REQUEST_COUNT.labels(route, request.method, str(resp.status_code)).inc()
+    return resp
+
+@app.route("/metrics")
+def metrics():
+    """
+    Prometheus 形式のメトリクス。prometheus_client が無ければ 404。
+    METRICS_TOKEN を設定した場合は Authorization: Bearer <METRICS_TOKEN> が必要。
+    """
+    if not METRICS_AVAILABLE:
+        abort(404)
+    _require_bearer("METRICS_TOKEN", optional=True)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # 全ワーカーのファイルを集計する
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return app.response_class(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+# ==============================
+# 管理コマンド（flask --app app <command>）
+# ==============================
+def explain_list_query(eng, force_index: bool = False, view: ListView = ListView()) -> List[str]:
+    """
+    先頭ページ取得クエリの実行計画を行のリストで返す。
+    PostgreSQL では force_index=True で seqscan を無効化し、
+    行数が少なくてもインデックスが「使える」かを確認できる。
+    """
+    stmt = build_list_query(view=view)
+    sql = str(stmt.compile(dialect=eng.dialect, compile_kwargs={"literal_binds": True}))
+    with eng.begin() as conn:
+        if eng.dialect.name == "postgresql":
+            if force_index:
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+            rows = conn.exec_driver_sql("EXPLAIN " + sql).all()
+            return [r[0] for r in rows]
+        if eng.dialect.name == "sqlite":
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).all()
+            return [str(r[-1]) for r in rows]
+        rows = conn.exec_driver_sql("EXPLAIN " + sql).all()
+        return [" ".join(str(c) for c in r) for r in rows]
+
+@app.cli.command("init-db")
+@click.option("--recount-facets", is_flag=True, help="トリガが最新でも件数表を数え直す")
+def init_db_command(recount_facets: bool) -> None:
+    """テーブル・インデックス・検索索引を作成する（デプロイ時に 1 回実行）。"""
+    engine = get_engine()
+    if engine is None:
+        raise click.ClickException("DATABASE_URL が未設定です。")
+    init_schema(engine)
+    if recount_facets:
+        ensure_minutes_counts(engine, force=True)
+    click.echo("OK: schema ready.")
+
+def expected_list_index(view: ListView) -> str:
+    """view の一覧クエリが使うべきインデックス名。"""
+    if view.order.columns[0] is Recipe.minutes:
+        return minutes_index.name
+    if view.minutes is not None:
+        return f"ix_recipes_{view.minutes}_created_at_id_desc"
+    return LIST_INDEX_NAME
+
+@app.cli.command("check-list-index")
+@click.option("--force-index", is_flag=True, help="PostgreSQL で seqscan を無効化して確認する")
+@click.option("--minutes", type=click.Choice(list(MINUTES_BUCKETS)), default=None, help="所要分数の区分で絞り込む")
+@click.option("--sort", type=click.Choice(list(SORT_ORDERS)), default=DEFAULT_SORT, show_default=True)
+def check_list_index_command(force_index: bool, minutes: Optional[str], sort: str) -> None:
+    """一覧クエリが専用のインデックスを使っているかを実行計画で確認する。"""
+    engine = get_engine()
+    if engine is None:
+        raise click.ClickException("DATABASE_URL が未設定です。")
+    view = ListView(minutes, sort)
+    index_name = expected_list_index(view)
+    plan = explain_list_query(engine, force_index=force_index, view=view)
+    for line in plan:
+        click.echo(line)
+    if not any(index_name in line for line in plan):
+        click.echo(f"NG: {index_name} が使われていません。", err=True)
+        sys.exit(1)
+    click.echo(f"OK: {index_name} が使われています。")
+
+@app.cli.command("import-recipes")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None,
+              help="省略時は拡張子から判定（.ndjson / .jsonl 以外は csv）")
+@click.option("--batch-size", type=int, default=IMPORT_BATCH_SIZE, show_default=True)
+def import_recipes_command(path: str, fmt: Optional[str], batch_size: int) -> None:
+    """CSV / NDJSON ファイルからレシピを一括登録する。"""
+    engine = get_engine()
+    if engine is None:
+        raise click.ClickException("DATABASE_URL が未設定です。")
+    fmt = fmt or _detect_import_format(path, None)
+    with open(path, "rb") as f:
+        report = import_recipes(engine, _open_import_records(f, fmt), batch_size=max(1, batch_size))
+    for err in report.errors:
+        click.echo(f"{err['line']}行目: {' '.join(err['errors'])}", err=True)
+    click.echo(
+        f"OK: {report.inserted} 件登録 / {report.rejected} 件スキップ "
+        f"（{report.seconds:.2f} 秒, {report.rows_per_sec:.0f} 行/秒）"
+    )
+
+@app.cli.command("export-recipes")
+@click.option("--output", "-o", type=click.Path(dir_okay=False, writable=True), default=None,
+              help="出力先（省略時は標準出力）")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None,
+              help="省略時は出力先の拡張子から判定（.ndjson / .jsonl 以外は csv）")
+@click.option("--since", default=None, help="created_at がこの日時以降のレシピだけを出力（ISO 8601）")
+@click.option("--after-id", type=int, default=None,
+              help="--since と併用し、(created_at, id) がそれより後のレシピだけを出力（差分エクスポート）")
+@click.option("--batch-size", type=int, default=EXPORT_BATCH_SIZE, show_default=True)
+def export_recipes_command(
+    output: Optional[str], fmt: Optional[str], since: Optional[str], after_id: Optional[int], batch_size: int
+) -> None:
+    """レシピを CSV / NDJSON に書き出す（古い順、一定のメモリ使用量で）。"""
+    engine = get_engine()
+    if engine is None:
+        raise click.ClickException("DATABASE_URL が未設定です。")
+    try:
+        since_at = parse_since(since)
+    except ValueError:
+        raise click.BadParameter("ISO 8601 の日付または日時で指定してください。", param_hint="--since")
+    if after_id is not None and since_at is None:
+        raise click.BadParameter("--since と一緒に指定してください。", param_hint="--after-id")
+    fmt = fmt or _detect_import_format(output, None)
+    report = ExportReport()
+    with click.open_file(output or "-", "wb") as out, connect_for_read() as conn:
+        for chunk in export_recipes(
+            conn, fmt, report, since=since_at, after_id=after_id, batch_size=max(1, batch_size)
+        ):
+            out.write(chunk)
+    click.echo(
+        f"OK: {report.exported} 件出力（{report.seconds:.2f} 秒, {report.rows_per_sec:.0f} 行/秒）",
+        err=True,
     )
+    if report.last is not None:
+        click.echo(
+            f"次回の差分: --since {report.last.created_at.isoformat()} --after-id {report.last.id}", err=True
+        )
 
 # ==============================
 # アプリ起動
@@ -0,0 +1,477 @@
+# bench.py（性能計測用スクリプト）
+# 使い方: python bench.py render [--sizes 10,1000,10000] [--repeat 20]
+#         python bench.py hydrate [--sizes 100,1000,10000] [--repeat 20]
+#         python bench.py search [--rows 100000] [--repeat 20] [--url sqlite:////tmp/bench.db]
+#         python bench.py startup [--repeat 5] [--url postgresql://...]
+#         python bench.py load [--rows 1000,100000] [--target client,gunicorn] [--clients 8]
+#                              [--requests 400] [--post-ratio 0.1] [--url ...] [--save-baseline]
+"""
+レシピ投稿ミニアプリのマイクロベンチマーク。
+- render:  一覧ページの描画コスト（毎回コンパイル vs コンパイル済みテンプレート）
+- hydrate: 一覧の取得コスト（ORM エンティティ vs 列射影 RecipeRow）
+- search:  /search の検索レイテンシ（バイグラム索引, 既定 10 万行）
+- startup: 別プロセスでの import 時間と最初の GET / の応答時間（ワーカーのコールドスタート）
+- load:    N 行を入れた DB に GET / と POST / を並行に送る負荷試験（Flask テストクライアント
+           と実際の gunicorn）。p50/p95/p99 とスループットを出し、保存済みのベースラインと比べる
+DATABASE_URL の DB には接続しない（既定はメモリ上または一時ファイルの SQLite。search / load は
+--url で PostgreSQL などを指定できるが、その DB に行を追加するので計測専用の DB を使うこと）。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from flask import render_template, render_template_string
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+import app as recipe_app
+import db_init
+
+
+def _fake_recipes(n: int) -> List[SimpleNamespace]:
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        SimpleNamespace(
+            id=i,
+            title=f"レシピ {i}",
+            minutes=(i % 90) + 1,
+            description="材料を切って炒める。" * (i % 3),
+            created_at=base + timedelta(minutes=i),
+        )
+        for i in range(n, 0, -1)
+    ]
+
+
+def _iter_recipe_batches(n: int, seed: int = 0, batch: int = 10000) -> Iterator[List[dict]]:
+    """db_init.generate_recipes の行を batch 件ずつまとめる（100 万行でもメモリに全部載せない）。"""
+    rows = db_init.generate_recipes(n, seed=seed)
+    while True:
+        chunk = list(islice(rows, batch))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _context(recipes: List[SimpleNamespace]) -> dict:
+    return dict(
+        errors=[],
+        recipes=recipes,
+        debug="False",
+        port=8000,
+        db_ready=True,
+        form_values={"title": "", "minutes": "", "description": ""},
+        pager=recipe_app.PageLinks(None, None),
+        search=None,
+        size=None,
+        view=recipe_app.ListView(),
+        minutes_buckets=recipe_app.MINUTES_BUCKETS,
+        minutes_counts=None,
+        recipe_total=None,
+        sort_orders=recipe_app.SORT_ORDERS,
+    )
+
+
+def _time_per_call(fn: Callable[[], object], repeat: int) -> float:
+    fn()  # ウォームアップ
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_render(sizes: List[int], repeat: int) -> None:
+    print(f"{'rows':>8} {'string(ms)':>12} {'compiled(ms)':>13} {'speedup':>8}")
+    with recipe_app.app.test_request_context("/"):
+        for n in sizes:
+            ctx = _context(_fake_recipes(n))
+            t_string = _time_per_call(
+                lambda: render_template_string(recipe_app.PAGE_TEMPLATE, **ctx), repeat
+            )
+            t_compiled = _time_per_call(
+                lambda: render_template(recipe_app.get_page_template(), **ctx), repeat
+            )
+            print(
+                f"{n:>8} {t_string * 1000:>12.3f} {t_compiled * 1000:>13.3f} "
+                f"{t_string / t_compiled:>7.2f}x"
+            )
+
+
+def _seeded_sqlite(n: int):
+    eng = create_engine("sqlite://")
+    recipe_app.Base.metadata.create_all(eng)
+    rows = [
+        {"title": r.title, "minutes": r.minutes, "description": r.description or None,
+         "created_at": r.created_at}
+        for r in _fake_recipes(n)
+    ]
+    with eng.begin() as conn:
+        conn.execute(insert(recipe_app.Recipe), rows)
+    return eng
+
+
+def bench_hydrate(sizes: List[int], repeat: int) -> None:
+    Recipe = recipe_app.Recipe
+    print(f"{'rows':>8} {'orm(ms)':>10} {'rows(ms)':>10} {'speedup':>8}")
+    for n in sizes:
+        eng = _seeded_sqlite(n)
+        orm_stmt = select(Recipe).order_by(Recipe.created_at.desc(), Recipe.id.desc()).limit(n)
+
+        def orm_path() -> object:
+            with Session(eng) as session:
+                return session.scalars(orm_stmt).all()
+
+        def rows_path() -> object:
+            with eng.connect() as conn:
+                return recipe_app.fetch_recipe_page(conn, size=n)
+
+        t_orm = _time_per_call(orm_path, repeat)
+        t_rows = _time_per_call(rows_path, repeat)
+        print(f"{n:>8} {t_orm * 1000:>10.3f} {t_rows * 1000:>10.3f} {t_orm / t_rows:>7.2f}x")
+        eng.dispose()
+
+
+def bench_search(rows: int, repeat: int, url: str) -> None:
+    eng = create_engine(url)
+    recipe_app.prepare_search_engine(eng)
+    recipe_app.Base.metadata.create_all(eng)
+    recipe_app.list_index.create(eng, checkfirst=True)
+    t0 = time.perf_counter()
+    with eng.begin() as conn:
+        for batch in _iter_recipe_batches(rows):
+            conn.execute(insert(recipe_app.Recipe), batch)
+    # 行を入れてから索引を作る方が速い（SQLite では既存行をまとめて索引する）
+    recipe_app.ensure_search_index(eng)
+    print(f"seed: {rows} rows in {time.perf_counter() - t0:.1f}s ({eng.dialect.name})")
+
+    queries = ["卵", "焼き", "味噌汁", "本格 カレー", "豆腐 味噌", "存在しない料理"]
+    print(f"{'query':<12} {'hits':>5} {'p50(ms)':>9} {'max(ms)':>9}")
+    with eng.connect() as conn:
+        for q in queries:
+            found, _ = recipe_app.search_recipes(conn, q, size=recipe_app.PAGE_SIZE)
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                recipe_app.search_recipes(conn, q, size=recipe_app.PAGE_SIZE)
+                samples.append(time.perf_counter() - start)
+            print(f"{q:<12} {len(found):>5} {statistics.median(samples) * 1000:>9.3f} "
+                  f"{max(samples) * 1000:>9.3f}")
+    eng.dispose()
+
+
+_STARTUP_PROBE = """
+import time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+status = app.app.test_client().get("/").status_code
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1, status)
+"""
+
+
+def bench_startup(repeat: int, url: str) -> None:
+    tmpdir = None
+    if not url:
+        # 既定はスキーマ作成済みの一時 SQLite ファイル
+        tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmpdir.name, 'startup.db')}"
+        eng = create_engine(url)
+        recipe_app.prepare_search_engine(eng)
+        recipe_app.init_schema(eng)
+        eng.dispose()
+    env = dict(os.environ, DATABASE_URL=url)
+    here = os.path.dirname(os.path.abspath(__file__))
+    imports, firsts = [], []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _STARTUP_PROBE], cwd=here, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+        imports.append(float(out[0]))
+        firsts.append(float(out[1]))
+    print(f"import app:      p50 {statistics.median(imports) * 1000:8.1f} ms")
+    print(f"first GET /:     p50 {statistics.median(firsts) * 1000:8.1f} ms (status {out[2]})")
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+
+# ------------------------------
+# 負荷試験（load）
+# ------------------------------
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+
+def _seed_load_db(url: str, rows: int) -> None:
+    """recipes が空なら rows 件を入れ（既に行があればそのまま使う）、本番と同じスキーマに揃える。"""
+    eng = create_engine(url)
+    recipe_app.prepare_search_engine(eng)
+    recipe_app.Base.metadata.create_all(eng)
+    with eng.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(recipe_app.Recipe)).scalar_one()
+    if existing:
+        print(f"seed: reuse {existing} existing rows ({eng.dialect.name})")
+    else:
+        t0 = time.perf_counter()
+        for batch in _iter_recipe_batches(rows):
+            with eng.begin() as conn:
+                conn.execute(insert(recipe_app.Recipe), batch)
+        print(f"seed: {rows} rows in {time.perf_counter() - t0:.1f}s ({eng.dialect.name})")
+    # インデックス・検索索引・件数表のトリガは行を入れてから作る（既存行をまとめて索引・集計する）
+    recipe_app.init_schema(eng)
+    eng.dispose()
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    """最近接順位法のパーセンタイル（秒）。"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_samples) + 0.5)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def _run_load(send: Callable[[str, int], int], clients: int, requests: int,
+              post_ratio: float) -> Tuple[Dict[str, List[float]], int, float]:
+    """clients 本のスレッドから合計 requests 回 send(method, i) を呼び、種類別の所要時間を返す。"""
+    rnd = random.Random(0)
+    plan = ["POST" if rnd.random() < post_ratio else "GET" for _ in range(requests)]
+    samples: Dict[str, List[float]] = {"GET": [], "POST": []}
+    failures = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal failures
+        method = plan[i]
+        start = time.perf_counter()
+        try:
+            status = send(method, i)
+        except Exception:
+            status = 0
+        elapsed = time.perf_counter() - start
+        ok = status == (303 if method == "POST" else 200) or (method == "POST" and status == 302)
+        with lock:
+            samples[method].append(elapsed)
+            if not ok:
+                failures += 1
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, range(requests)))
+    return samples, failures, time.perf_counter() - wall
+
+
+def _post_form(i: int) -> Dict[str, str]:
+    return {"title": f"負荷試験レシピ {i}", "minutes": str(i % 120 + 1),
+            "description": "材料を切って炒める。"}
+
+
+def _client_sender(url: str) -> Callable[[str, int], int]:
+    """同じプロセス内で Flask のテストクライアントから送る（ネットワークを通さない）。"""
+    recipe_app.DATABASE_URL = url
+    recipe_app._engine = None
+    recipe_app.page_cache.clear()
+    local = threading.local()
+
+    def send(method: str, i: int) -> int:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = recipe_app.app.test_client()
+        if method == "POST":
+            return client.post("/", data=_post_form(i)).status_code
+        return client.get("/").status_code
+
+    return send
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _http_sender(base: str) -> Callable[[str, int], int]:
+    opener = urllib.request.build_opener(_NoRedirect)
+
+    def send(method: str, i: int) -> int:
+        data = urllib.parse.urlencode(_post_form(i)).encode() if method == "POST" else None
+        try:
+            with opener.open(base + "/", data=data, timeout=30) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    return send
+
+
+def _start_gunicorn(url: str, workers: int) -> Tuple[subprocess.Popen, str]:
+    """一時ポートで gunicorn を起動し、GET / が返るまで待つ。"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, DATABASE_URL=url)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}",
+         "app:app"],
+        cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {proc.returncode}")
+        try:
+            with urllib.request.urlopen(base + "/", timeout=5) as resp:
+                resp.read()
+            return proc, base
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn did not become ready within 30s")
+
+
+def _summarize(samples: Dict[str, List[float]], wall: float) -> Dict[str, Dict[str, float]]:
+    result = {}
+    for method, values in samples.items():
+        if not values:
+            continue
+        values.sort()
+        result[method] = {
+            "count": len(values),
+            "p50_ms": round(_percentile(values, 50) * 1000, 3),
+            "p95_ms": round(_percentile(values, 95) * 1000, 3),
+            "p99_ms": round(_percentile(values, 99) * 1000, 3),
+        }
+    result["ALL"] = {"count": sum(len(v) for v in samples.values()),
+                     "rps": round(sum(len(v) for v in samples.values()) / wall, 1)}
+    return result
+
+
+def _print_summary(key: str, summary: Dict[str, Dict[str, float]], failures: int,
+                   baseline: Dict[str, dict]) -> None:
+    """結果を表示する。ベースラインに同じキーがあれば p95 とスループットの増減率も出す。"""
+    base = baseline.get(key, {})
+    for method in ("GET", "POST"):
+        stats = summary.get(method)
+        if stats is None:
+            continue
+        line = (f"{key:<22} {method:<5} {stats['count']:>6} {stats['p50_ms']:>9.2f} "
+                f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+        if method in base:
+            line += f"  p95 {(stats['p95_ms'] / base[method]['p95_ms'] - 1) * 100:+6.1f}%"
+        print(line)
+    rps_line = f"{key:<22} {'rps':<5} {summary['ALL']['rps']:>9.1f}  failures {failures}"
+    if "ALL" in base:
+        rps_line += f"  rps {(summary['ALL']['rps'] / base['ALL']['rps'] - 1) * 100:+6.1f}%"
+    print(rps_line)
+
+
+def bench_load(rows_list: List[int], targets: List[str], clients: int, requests: int,
+               post_ratio: float, workers: int, url: str, save_baseline: bool) -> None:
+    baseline: Dict[str, dict] = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+    results: Dict[str, dict] = {}
+    print(f"{'run':<22} {'req':<5} {'count':>6} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}")
+    for rows in rows_list:
+        tmpdir = None
+        run_url = url
+        if not run_url:
+            # 既定は行数ごとに新しい一時 SQLite ファイル（gunicorn の別プロセスからも読める）
+            tmpdir = tempfile.TemporaryDirectory()
+            run_url = f"sqlite:///{os.path.join(tmpdir.name, 'load.db')}"
+        _seed_load_db(run_url, rows)
+        for target in targets:
+            key = f"{target}/{rows}"
+            if target == "client":
+                samples, failures, wall = _run_load(_client_sender(run_url), clients, requests,
+                                                    post_ratio)
+                recipe_app._engine.dispose()
+                recipe_app._engine = None
+            else:
+                proc, base = _start_gunicorn(run_url, workers)
+                try:
+                    samples, failures, wall = _run_load(_http_sender(base), clients, requests,
+                                                        post_ratio)
+                finally:
+                    proc.terminate()
+                    proc.wait(timeout=30)
+            results[key] = _summarize(samples, wall)
+            _print_summary(key, results[key], failures, baseline)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    if save_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {BASELINE_PATH}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_render = sub.add_parser("render", help="一覧ページの描画コスト")
+    p_render.add_argument("--sizes", default="10,1000,10000")
+    p_render.add_argument("--repeat", type=int, default=20)
+
+    p_hydrate = sub.add_parser("hydrate", help="一覧の取得コスト（ORM vs 列射影）")
+    p_hydrate.add_argument("--sizes", default="100,1000,10000")
+    p_hydrate.add_argument("--repeat", type=int, default=20)
+
+    p_search = sub.add_parser("search", help="検索レイテンシ")
+    p_search.add_argument("--rows", type=int, default=100000)
+    p_search.add_argument("--repeat", type=int, default=20)
+    p_search.add_argument("--url", default="sqlite://")
+
+    p_startup = sub.add_parser("startup", help="import 時間と最初のリクエストの応答時間")
+    p_startup.add_argument("--repeat", type=int, default=5)
+    p_startup.add_argument("--url", default="", help="省略時は一時 SQLite ファイル")
+
+    p_load = sub.add_parser("load", help="GET / と POST / の並行負荷試験")
+    p_load.add_argument("--rows", default="1000", help="例: 1000,100000,1000000")
+    p_load.add_argument("--target", default="client,gunicorn", help="client / gunicorn")
+    p_load.add_argument("--clients", type=int, default=8, help="同時に送るクライアント数")
+    p_load.add_argument("--requests", type=int, default=400, help="1 回の計測で送る総数")
+    p_load.add_argument("--post-ratio", type=float, default=0.1, help="POST の割合")
+    p_load.add_argument("--workers", type=int, default=2, help="gunicorn のワーカー数")
+    p_load.add_argument("--url", default="", help="省略時は一時 SQLite ファイル")
+    p_load.add_argument("--save-baseline", action="store_true",
+                        help="結果を bench_baseline.json に保存する")
+
+    args = parser.parse_args()
+    if args.command == "render":
+        bench_render([int(x) for x in args.sizes.split(",")], args.repeat)
+    elif args.command == "hydrate":
+        bench_hydrate([int(x) for x in args.sizes.split(",")], args.repeat)
+    elif args.command == "search":
+        bench_search(args.rows, args.repeat, args.url)
+    elif args.command == "startup":
+        bench_startup(args.repeat, args.url)
+    elif args.command == "load":
+        bench_load([int(x) for x in args.rows.split(",")], args.target.split(","),
+                   args.clients, args.requests, args.post_ratio, args.workers, args.url,
+                   args.save_baseline)
+
+
+if __name__ == "__main__":
+    main()
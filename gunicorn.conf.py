@@ -0,0 +1,21 @@
+# gunicorn.conf.py（gunicorn が起動時に自動で読み込む設定）
+# PROMETHEUS_MULTIPROC_DIR を指定したときだけ、/metrics の複数ワーカー集計用の後始末を行う。
+import glob
+import os
+
+
+def on_starting(server):
+    """前回起動時のメトリクスファイルを消してから始める。"""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in glob.glob(os.path.join(path, "*.db")):
+            os.remove(name)
+
+
+def child_exit(server, worker):
+    """終了したワーカーの livesum ゲージを集計から外す。"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)